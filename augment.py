@@ -0,0 +1,139 @@
+'''
+   augment.py
+   Batched augmentation of (batch, frames, bins) dBFS magnitude windows, applied before
+   the imaging step (imaging.magnitudes_to_image / downsample). Every transform is a
+   whole-batch array operation with per-sample parameters drawn from one seeded
+   generator, so a run is reproducible.
+
+   Bin shifts move the spectrum along the frequency axis, which is a physical range
+   offset of shift * freq_step * c / (2 * slope). The sample's truedist is moved by the
+   same amount and its label is recomputed from the class bin ranges; samples pushed
+   outside every class range (e.g. into the gap between two bins) are dropped.
+
+   Example:
+       augment = Augmenter(class_names=list_bin_dirs("DataSet"), noise_dbfs=(-60, -40),
+                           max_shift=1, gain_db=(-3, 3), drop_rate=0.05, reverse_prob=0.5)
+       for x, labels, truedist in BatchLoader(train, source="magnitude", transform=augment):
+           ...
+'''
+
+import numpy as np
+from data_analysis import parse_bin_range
+
+# Capture settings from FMCW_Bulk_Data_Export.py
+default_slope = 1000e6 / (450 / 1e6)            # chirp bandwidth / ramp time (Hz/s)
+default_freq_step = 522000 / (256 - 1)          # spacing of the exported frequency bins (Hz)
+
+def range_per_bin(freq_step=default_freq_step, slope=default_slope, c=3e8):
+    """ Range offset (m) of a one-bin shift """
+    return freq_step * c / (2 * slope)
+
+def add_noise(x, noise_dbfs, rng):
+    """ Adds noise power at noise_dbfs (scalar or per sample) to dBFS magnitudes
+    Noise power per cell is exponentially distributed (|complex Gaussian|^2) and is
+    summed with the signal power, so strong returns are barely changed.
+    """
+    noise_dbfs = np.broadcast_to(np.asarray(noise_dbfs, dtype=float), x.shape[:1])
+    noise_power = rng.exponential(1.0, x.shape) * 10 ** (noise_dbfs[:, None, None] / 10)
+    return 10 * np.log10(10 ** (x / 10) + noise_power)
+
+def shift_bins(x, shifts, fill="median"):
+    """ Shifts each sample along the bin axis by shifts[i] bins (positive = farther range)
+    Args:
+        x (np.array): (batch, frames, bins)
+        shifts (np.array): Integer shift per sample
+        fill (str or float): Value for bins shifted in from outside, 'median' uses each
+            frame's median (its noise floor)
+    """
+    num_bins = x.shape[-1]
+    source = np.arange(num_bins)[None, :] - np.asarray(shifts, dtype=int)[:, None]
+    outside = (source < 0) | (source >= num_bins)
+    shifted = np.take_along_axis(x, np.clip(source, 0, num_bins - 1)[:, None, :], axis=-1)
+    fill_value = np.median(x, axis=-1, keepdims=True) if fill == "median" else fill
+    return np.where(outside[:, None, :], fill_value, shifted)
+
+def scale_gain(x, gain_db):
+    """ Applies a gain (dB, scalar or per sample); in dBFS this is an offset """
+    gain_db = np.broadcast_to(np.asarray(gain_db, dtype=float), x.shape[:1])
+    return x + gain_db[:, None, None]
+
+def drop_frames(x, rate, rng):
+    """ Replaces a random fraction of frames with the previous kept frame, like a missed buffer """
+    batch, frames = x.shape[:2]
+    dropped = rng.random((batch, frames)) < rate
+    dropped[:, 0] = False
+    # Index of the most recent kept frame at every position
+    source = np.maximum.accumulate(np.where(dropped, 0, np.arange(frames)[None, :]), axis=1)
+    return np.take_along_axis(x, source[:, :, None], axis=1)
+
+def reverse_time(x, flags):
+    """ Reverses the frame order of the samples where flags is True """
+    return np.where(np.asarray(flags)[:, None, None], x[:, ::-1], x)
+
+def relabel(labels, truedist, offsets_m, class_names):
+    """ Moves truedist by offsets_m and recomputes labels from the class bin ranges
+    Classes without a range in their name (no_object) keep their label and distance.
+    Returns:
+        tuple: (labels, truedist) with label -1 where the new distance is in no class
+    """
+    ranges = [parse_bin_range(name) for name in class_names]
+    has_range = np.array([low is not None for low, _ in ranges])
+    lows = np.array([np.inf if low is None else low for low, _ in ranges])
+    highs = np.array([-np.inf if high is None else high for _, high in ranges])
+
+    labels = np.asarray(labels)
+    moved = has_range[labels]
+    new_dist = np.where(moved, truedist + offsets_m, truedist)
+    inside = (new_dist[:, None] >= lows) & (new_dist[:, None] <= highs)
+    new_labels = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+    return np.where(moved, new_labels, labels), new_dist.astype(np.asarray(truedist).dtype)
+
+class Augmenter:
+    """ Random augmentation of whole batches, usable as a BatchLoader transform
+    Args:
+        class_names (list): Bin directory names in label order (sorted, as index_dataset uses)
+        noise_dbfs (tuple): (low, high) noise level range, None to disable
+        max_shift (int): Largest bin shift in either direction, 0 to disable
+        gain_db (tuple): (low, high) gain range, None to disable
+        drop_rate (float): Fraction of frames dropped
+        reverse_prob (float): Probability of reversing a sample in time
+        freq_step (float): Hz between exported bins
+        slope (float): Chirp slope (Hz/s)
+        seed (int): Seed for the generator
+    """
+    def __init__(self, class_names, noise_dbfs=None, max_shift=0, gain_db=None, drop_rate=0.0,
+                 reverse_prob=0.0, freq_step=default_freq_step, slope=default_slope, seed=0):
+        self.class_names = list(class_names)
+        self.noise_dbfs = noise_dbfs
+        self.max_shift = max_shift
+        self.gain_db = gain_db
+        self.drop_rate = drop_rate
+        self.reverse_prob = reverse_prob
+        self.bin_range_m = range_per_bin(freq_step, slope)
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, x, labels, truedist):
+        """ Augments one batch
+        Returns:
+            tuple: (x, labels, truedist) without the samples that were shifted out of every class
+        """
+        rng = self.rng
+        dtype = x.dtype
+        x = np.asarray(x, dtype=np.float64)
+        batch = len(x)
+        if self.max_shift:
+            shifts = rng.integers(-self.max_shift, self.max_shift + 1, batch)
+            x = shift_bins(x, shifts)
+            labels, truedist = relabel(labels, truedist, shifts * self.bin_range_m, self.class_names)
+            keep = labels >= 0
+            x, labels, truedist = x[keep], labels[keep], truedist[keep]
+            batch = len(x)
+        if self.gain_db is not None:
+            x = scale_gain(x, rng.uniform(*self.gain_db, batch))
+        if self.noise_dbfs is not None:
+            x = add_noise(x, rng.uniform(*self.noise_dbfs, batch), rng)
+        if self.drop_rate:
+            x = drop_frames(x, self.drop_rate, rng)
+        if self.reverse_prob:
+            x = reverse_time(x, rng.random(batch) < self.reverse_prob)
+        return x.astype(dtype), labels, truedist
@@ -0,0 +1,165 @@
+'''
+   batch_loader.py
+   Framework-agnostic training loader for the DataSet tree. Yields shuffled NumPy
+   batches of (images or magnitude matrices, bin labels, truedist) while a thread or
+   process pool reads and decodes the next batches into a bounded prefetch queue.
+
+   Train/val splits are made by session timestamp, so every image of a capture
+   session lands in the same split.
+
+   Example:
+       samples = index_dataset("DataSet")
+       train, val = split_by_session(samples, val_fraction=0.2, seed=0)
+       for x, y, truedist in BatchLoader(train, batch_size=32, seed=0):
+           ...
+'''
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from dataset_io import iter_filtered_csvs, load_filtered_csv, parse_sample_name
+
+def index_dataset(base_dir="DataSet"):
+    """List every sample in the dataset with its filename-derived labels.
+
+    Returns:
+        list: dicts with csv_path, png_path, bin_dir, label (index into the sorted
+            bin names), session, truedist and calcdist
+    """
+    entries = []
+    for bin_dir, csv_path in iter_filtered_csvs(base_dir):
+        info = parse_sample_name(csv_path)
+        if info is None:
+            print(f"Warning: Could not parse sample name '{csv_path}', skipping")
+            continue
+        png_name = os.path.splitext(os.path.basename(csv_path))[0] + ".png"
+        entries.append({
+            "csv_path": csv_path,
+            "png_path": os.path.join(base_dir, bin_dir, "Images", png_name),
+            "bin_dir": bin_dir,
+            "session": info["session"],
+            "truedist": info["truedist"],
+            "calcdist": info["calcdist"],
+        })
+    class_names = sorted({entry["bin_dir"] for entry in entries})
+    for entry in entries:
+        entry["label"] = class_names.index(entry["bin_dir"])
+    return entries
+
+def split_by_session(samples, val_fraction=0.2, seed=0, val_sessions=None):
+    """Split samples into train and val without breaking up capture sessions.
+
+    Args:
+        samples (list): Output of index_dataset()
+        val_fraction (float): Approximate fraction of samples for validation, used
+            when val_sessions is not given
+        seed (int): Seed for the session shuffle
+        val_sessions (iterable): Explicit session timestamps to use for validation
+    Returns:
+        tuple: (train_samples, val_samples)
+    """
+    sessions = sorted({s["session"] for s in samples})
+    if val_sessions is None:
+        order = np.random.default_rng(seed).permutation(len(sessions))
+        sizes = {session: 0 for session in sessions}
+        for s in samples:
+            sizes[s["session"]] += 1
+        val_sessions, val_count = set(), 0
+        for i in order:
+            if val_count >= val_fraction * len(samples):
+                break
+            val_sessions.add(sessions[i])
+            val_count += sizes[sessions[i]]
+    val_sessions = set(val_sessions)
+    train = [s for s in samples if s["session"] not in val_sessions]
+    val = [s for s in samples if s["session"] in val_sessions]
+    return train, val
+
+def load_sample(sample, source="image"):
+    """Read one sample as an array.
+
+    Images are returned as RGB uint8 (height, width, 3), magnitude matrices as
+    float32 (frames, bins) dBFS.
+    """
+    if source == "image":
+        import cv2 # type: ignore
+        image = cv2.imread(sample["png_path"])
+        if image is None:
+            raise IOError(f"Could not read {sample['png_path']}")
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    elif source == "magnitude":
+        _, _, magnitudes, _ = load_filtered_csv(sample["csv_path"])
+        return magnitudes.astype(np.float32)
+    raise ValueError(f"Unknown source '{source}'")
+
+def load_batch(samples, source="image"):
+    """Read and stack a list of samples into (x, labels, truedist) arrays."""
+    x = np.stack([load_sample(s, source) for s in samples])
+    labels = np.array([s["label"] for s in samples], dtype=np.int64)
+    truedist = np.array([s["truedist"] for s in samples], dtype=np.float32)
+    return x, labels, truedist
+
+class BatchLoader:
+    """ Iterable over shuffled batches with background prefetching
+    Args:
+        samples (list): Samples from index_dataset() / split_by_session()
+        batch_size (int): Samples per batch
+        source (str): 'image' for the PNGs, 'magnitude' for the FilteredCSV matrices
+        shuffle (bool): Reshuffle every epoch
+        seed (int): Base seed; epoch n uses seed + n so runs are reproducible
+        num_workers (int): Size of the read/decode pool
+        prefetch (int): Maximum number of batches queued ahead of the consumer; each
+            queued batch is read by one worker, so keep this at least num_workers
+        use_processes (bool): Use a process pool instead of threads
+        drop_last (bool): Skip the final short batch
+        transform (callable): Applied to every (x, labels, truedist) batch in the consuming
+            thread, e.g. an augment.Augmenter
+    """
+    def __init__(self, samples, batch_size=32, source="image", shuffle=True, seed=0,
+                 num_workers=4, prefetch=4, use_processes=False, drop_last=False, transform=None):
+        self.samples = list(samples)
+        self.batch_size = batch_size
+        self.source = source
+        self.shuffle = shuffle
+        self.seed = seed
+        self.num_workers = num_workers
+        self.prefetch = max(1, prefetch)
+        self.use_processes = use_processes
+        self.drop_last = drop_last
+        self.transform = transform
+        self.epoch = 0
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.samples) // self.batch_size
+        return -(-len(self.samples) // self.batch_size)
+
+    def batch_order(self, epoch):
+        """Sample indices for each batch of the given epoch."""
+        if self.shuffle:
+            order = np.random.default_rng(self.seed + epoch).permutation(len(self.samples))
+        else:
+            order = np.arange(len(self.samples))
+        return [order[start:start + self.batch_size]
+                for start in range(0, len(self) * self.batch_size, self.batch_size)]
+
+    def __iter__(self):
+        batches = self.batch_order(self.epoch)
+        self.epoch += 1
+        pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with pool_class(max_workers=self.num_workers) as executor:
+            pending = deque()
+            next_batch = 0
+            try:
+                while pending or next_batch < len(batches):
+                    # Keep up to `prefetch` batches in flight ahead of the consumer
+                    while next_batch < len(batches) and len(pending) < self.prefetch:
+                        batch_samples = [self.samples[i] for i in batches[next_batch]]
+                        pending.append(executor.submit(load_batch, batch_samples, self.source))
+                        next_batch += 1
+                    batch = pending.popleft().result()
+                    yield self.transform(*batch) if self.transform else batch
+            finally:
+                for future in pending:
+                    future.cancel()
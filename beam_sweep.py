@@ -0,0 +1,108 @@
+'''
+   beam_sweep.py
+   Receive beam sweep: steps the Phaser through a list of steering angles, captures K
+   frames at each angle and builds a range x angle magnitude map. The raw buffers of a
+   whole sweep are stacked and go through one batched compute_spectrum() call, the K
+   frames of each angle are power-averaged, and cfar_batch() runs across the angle stack.
+   Phase writes go through the phaser's CachedConfig, so only channels whose phase
+   changed are written at each step.
+
+   Usage: python3 beam_sweep.py --angles -40 40 5 --frames 8 --sweeps 3 --out sweep.npz
+'''
+
+import argparse
+import numpy as np
+import radar_hardware
+from fmcw_processing import freq_to_range
+from session_scheduler import RADAR_DEFAULTS, Radar
+from target_detection_dbfs import cfar_batch
+
+def steer_phase_delta(angle_deg, output_freq, element_spacing, c=3e8):
+    """ Phase difference (degrees) between adjacent elements to steer to angle_deg, as in get_steer_angle() """
+    return np.degrees(2 * np.pi * output_freq * element_spacing * np.sin(np.radians(angle_deg)) / c)
+
+def angle_list(start, stop, step):
+    """ Angles from start to stop inclusive """
+    return list(np.round(np.arange(start, stop + step / 2, step), 6))
+
+def capture_sweep(radar, angles, frames_per_angle, element_spacing=None):
+    """ Steers to each angle in turn and captures frames_per_angle raw buffers there
+    Args:
+        radar (Radar): Configured radar from session_scheduler
+        angles (list): Steering angles in degrees
+        frames_per_angle (int): Frames (K) captured at each angle
+        element_spacing (float): Element spacing in m, read from the phaser if None
+    Returns:
+        np.array: (angles, K, samples) complex buffers
+    """
+    if element_spacing is None:
+        element_spacing = radar.my_phaser.element_spacing
+    buffers = []
+    for angle in angles:
+        phase_delta = steer_phase_delta(angle, radar.settings["output_freq"], element_spacing)
+        radar_hardware.set_beam_phase_diff(radar.phaser_config, phase_delta)
+        buffers.append([radar.capture_raw() for _ in range(frames_per_angle)])
+    return np.array(buffers)
+
+def range_angle_map(radar, buffers, cfar_guard=None, cfar_ref=None, cfar_bias=None):
+    """ Range x angle map from a sweep's raw buffers
+    Args:
+        radar (Radar): Radar the buffers came from (timing, frequency axis, band)
+        buffers (np.array): (angles, K, samples) from capture_sweep()
+    Returns:
+        dict: ranges (bins,), magnitudes (angles, bins) dBFS averaged over the K frames,
+            threshold (angles, bins) CFAR threshold, detections (angles, bins) bool, all
+            over the lower_freq..upper_freq band
+    """
+    settings = radar.settings
+    spectra = radar.spectrum(buffers)                       # (angles, K, fft_size)
+    power = np.mean(10 ** (spectra / 10), axis=1)           # average the K frames in power
+    magnitudes = 10 * np.log10(power)
+    threshold, targets = cfar_batch(magnitudes,
+                                    settings["cfar_guard"] if cfar_guard is None else cfar_guard,
+                                    settings["cfar_ref"] if cfar_ref is None else cfar_ref,
+                                    settings["cfar_bias"] if cfar_bias is None else cfar_bias, 'average')
+    band = (radar.freq >= radar.lower_freq) & (radar.freq <= radar.upper_freq)
+    return {
+        "ranges": freq_to_range(radar.freq[band], radar.slope, radar.ref_freq, 3e8),
+        "magnitudes": magnitudes[:, band],
+        "threshold": threshold[:, band],
+        "detections": ~np.ma.getmaskarray(targets)[:, band],
+    }
+
+def run_sweeps(radar, angles, frames_per_angle, num_sweeps=1, restore_angle=0):
+    """ Runs num_sweeps sweeps and returns their maps stacked along a first sweep axis """
+    maps = []
+    try:
+        for sweep in range(num_sweeps):
+            buffers = capture_sweep(radar, angles, frames_per_angle)
+            maps.append(range_angle_map(radar, buffers))
+            best = np.unravel_index(np.argmax(maps[-1]["magnitudes"]), maps[-1]["magnitudes"].shape)
+            print(f"Sweep {sweep+1}/{num_sweeps}: strongest return {maps[-1]['magnitudes'][best]:.1f} dBFS "
+                  f"at {angles[best[0]]:.1f} deg, {maps[-1]['ranges'][best[1]]:.2f} m")
+    finally:
+        if restore_angle is not None:
+            phase_delta = steer_phase_delta(restore_angle, radar.settings["output_freq"], radar.my_phaser.element_spacing)
+            radar_hardware.set_beam_phase_diff(radar.phaser_config, phase_delta)
+    return {key: np.stack([m[key] for m in maps]) if key != "ranges" else maps[0][key] for key in maps[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep the receive beam and save range x angle maps.')
+    parser.add_argument('--angles', type=float, nargs=3, default=[-40, 40, 5], metavar=('START', 'STOP', 'STEP'),
+                        help='Steering angles in degrees (default: -40 40 5)')
+    parser.add_argument('--frames', type=int, default=8, help='Frames per angle (default: 8)')
+    parser.add_argument('--sweeps', type=int, default=1, help='Number of sweeps (default: 1)')
+    parser.add_argument('--out', default='sweep.npz', help='Output file (default: sweep.npz)')
+    args = parser.parse_args()
+
+    angles = angle_list(*args.angles)
+    radar = Radar(dict(RADAR_DEFAULTS))
+    try:
+        maps = run_sweeps(radar, angles, args.frames, args.sweeps)
+    finally:
+        radar.close()
+    np.savez(args.out, angles=np.array(angles), **maps)
+    print(f"Saved {args.sweeps} maps of {len(angles)} angles x {len(maps['ranges'])} ranges to {args.out}")
+
+if __name__ == "__main__":
+    main()
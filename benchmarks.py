@@ -0,0 +1,282 @@
+'''
+   benchmarks.py
+   Reproducible timing benchmarks for the processing and dataset paths. Runs on seeded
+   synthetic spectra and on a small fixture copied from the first files of each DataSet
+   bin, writes machine-readable results, and compares them against a stored baseline.
+
+   Each case is timed repeat times and compared on its fastest run (min_s), which is
+   far less sensitive to other load on the machine than the median. A short reference
+   workload is timed right before each case (reference_s), and cases are compared by
+   their time relative to it, so a machine that is running slower overall (frequency
+   scaling, other tenants) is not reported as a code regression. A case only counts
+   as a regression when it is slower than the baseline by more than the larger of
+   --threshold and twice the measured spread ((median - min) / min of both runs), and
+   it is still that slow after being re-measured, once the full pass is done, with
+   three times the repeats (up to twice).
+
+   bench_baseline.json in the repository holds timings from the one machine in its
+   "meta" block and is only meaningful there. Slowdowns against it are reported but do
+   not fail the run: on a shared or virtualized machine individual cases still vary by
+   tens of percent between runs with no code change. For a pass/fail gate, record a
+   baseline on a quiet dedicated machine with --save-baseline and compare against it
+   there with --fail-on-regression.
+
+   Usage: python3 benchmarks.py --out bench.json --save-baseline
+          python3 benchmarks.py --baseline bench_baseline.json --threshold 0.15 --fail-on-regression
+'''
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from target_detection_dbfs import cfar, cfar_batch
+from fmcw_processing import compute_spectrum, export_session
+from compact_storage import encode_frames, decode_frames
+from dataset_io import iter_filtered_csvs
+from data_analysis import analyze_dataset
+from datarate import calculate_avg_sample_rate
+
+# Capture settings from FMCW_Bulk_Data_Export.py
+sample_rate = 522000
+signal_freq = 100000
+slope = 1000e6 / (450 / 1e6)
+c = 3e8
+
+NOISE_FACTOR = 2   # allowed slowdown in multiples of the measured spread
+RECHECKS = 2       # re-measurements of flagged cases before they are reported
+
+def time_call(func, repeat=15, warmup=1):
+    """Run func warmup + repeat times and return timing stats for the timed runs."""
+    for _ in range(warmup):
+        func()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    median, fastest = float(np.median(runs)), float(np.min(runs))
+    return {"median_s": median, "min_s": fastest, "spread": (median - fastest) / fastest, "runs": len(runs)}
+
+def allowed_slowdown(stats, base, threshold):
+    """Slowdown (fraction) above which stats counts as slower than base, given their noise"""
+    return max(threshold, NOISE_FACTOR * (stats.get("spread", 0) + base.get("spread", 0)))
+
+def slowdown(stats, base):
+    """Slowdown (fraction) of stats vs base, each relative to the reference workload timed
+    next to it (absolute times if either has no reference_s)"""
+    if stats.get("reference_s") and base.get("reference_s"):
+        return (stats["min_s"] / stats["reference_s"]) / (base["min_s"] / base["reference_s"]) - 1
+    return stats["min_s"] / base["min_s"] - 1
+
+def calibration_workload(data):
+    """Fixed mix of small numpy calls in a Python loop, like the CFAR inner loops. Timed next
+    to every case as a yardstick for how fast the machine is running at that moment."""
+    total = 0.0
+    for i in range(0, len(data) - 32):
+        total += np.mean(data[i:i + 32])
+    return total
+
+def synthetic_spectrum(fft_size, rng, num_frames=None):
+    """dBFS spectrum (or frames x bins stack) with a noise floor and one target peak."""
+    shape = (fft_size,) if num_frames is None else (num_frames, fft_size)
+    spectrum = rng.normal(-60, 3, shape)
+    spectrum[..., int(fft_size * 0.75)] = -15
+    return spectrum
+
+def synthetic_rx(buffer_size, rng):
+    """Complex buffer holding a beat tone plus noise, like Rx1 + Rx2 from my_sdr.rx()."""
+    t = np.arange(buffer_size) / sample_rate
+    tone = np.exp(2j * np.pi * (signal_freq + 30e3) * t) * 2 ** 11
+    return tone + rng.normal(0, 20, buffer_size) + 1j * rng.normal(0, 20, buffer_size)
+
+def synthetic_session(fft_size, num_frames, rng):
+    """data_list rows for a full session, as store_data() would have built them."""
+    freq = np.linspace(-sample_rate/2, sample_rate/2, fft_size)
+    rows = []
+    for frame in range(num_frames):
+        peak_range = 0.34 if frame % 5 else None
+        for f, mag in zip(freq, synthetic_spectrum(fft_size, rng)):
+            rows.append([frame * 0.03, f, mag, peak_range])
+    return rows
+
+def make_fixture(base_dir, fixture_dir, files_per_bin=3):
+    """Copy the first files_per_bin FilteredCSV files of every bin into fixture_dir."""
+    copied = {}
+    for bin_dir, csv_path in iter_filtered_csvs(base_dir):
+        if copied.get(bin_dir, 0) >= files_per_bin:
+            continue
+        dest = os.path.join(fixture_dir, bin_dir, "FilteredCSV")
+        os.makedirs(dest, exist_ok=True)
+        shutil.copy(csv_path, dest)
+        copied[bin_dir] = copied.get(bin_dir, 0) + 1
+    return sum(copied.values())
+
+def quiet(func):
+    """Wrap func so its console output doesn't swamp the benchmark report."""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+    return run
+
+def run_benchmarks(base_dir="DataSet", repeat=15, seed=0, only=None):
+    """Run every benchmark case (or only the named ones) and return {case name: timing stats}."""
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    reference = np.random.default_rng(0).normal(size=1024)
+
+    def measure(name, func, times):
+        if only is None or name in only:
+            reference_s = time_call(lambda: calibration_workload(reference), 5)["min_s"]
+            results[name] = dict(time_call(func, times), reference_s=reference_s)
+
+    for method in ['average', 'greatest', 'smallest', 'false_alarm']:
+        for fft_size in [256, 1024, 4096]:
+            spectrum = synthetic_spectrum(fft_size, rng)
+            for guard, ref in [(15, 16), (4, 8)]:
+                measure(f"cfar/{method}/fft{fft_size}/g{guard}r{ref}",
+                        lambda: cfar(spectrum, guard, ref, 25, method), repeat)
+        frames = synthetic_spectrum(256, rng, num_frames=57)
+        measure(f"cfar_batch/{method}/57x256/g15r16", lambda: cfar_batch(frames, 15, 16, 25, method), repeat)
+
+    for fft_size, good_ramp_samples in [(256, 211), (1024, 900)]:
+        rx = synthetic_rx(int(fft_size * 1.75), rng)
+        offset = int(0.045e-3 * sample_rate)
+        measure(f"spectrum/fft{fft_size}",
+                lambda: compute_spectrum(rx, fft_size, offset, min(good_ramp_samples, fft_size - offset)), repeat * 20)
+
+    frames = synthetic_spectrum(60, rng, num_frames=57)
+    times, ranges = np.arange(57) * 0.03, np.full(57, 0.34)
+    measure("compact/encode_decode/57x60",
+            lambda: decode_frames(encode_frames(times, np.arange(60.0), frames, ranges)), repeat * 20)
+
+    img_size, num_img = 56, 25
+    session = synthetic_session(256, img_size * num_img + num_img + 2, rng)
+    start_time = datetime.datetime(2025, 3, 18, 13, 34, 8)
+    lower_freq = signal_freq + 25e3
+    upper_freq = (89 * 2.54 / 100 * 2 * slope / c) + signal_freq + 25e3
+    with tempfile.TemporaryDirectory() as out_dir:
+        def export():
+            shutil.rmtree(out_dir, ignore_errors=True)
+            export_session(session, start_time, os.path.join(out_dir, "Images"), os.path.join(out_dir, "CSV"),
+                           256, lower_freq, upper_freq, img_size, num_img, 0.368, "0.37-0.52")
+        measure(f"export_session/{num_img}x{img_size}", quiet(export), max(1, repeat // 2))
+
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        num_files = make_fixture(base_dir, fixture_dir)
+        if num_files:
+            measure(f"analyze_dataset/{num_files}files", quiet(lambda: analyze_dataset(fixture_dir)), repeat)
+            first_csv = next(iter_filtered_csvs(fixture_dir))[1]
+            measure("calculate_avg_sample_rate/1file", quiet(lambda: calculate_avg_sample_rate(first_csv)), repeat)
+        else:
+            print(f"Warning: No fixture files found under {base_dir}, skipping dataset benchmarks")
+
+    return results
+
+def merge(stats, again):
+    """Stats of two measurements of one case, keeping the one that ran relatively fastest"""
+    best = again if slowdown(again, stats) < 0 else stats
+    return dict(best, runs=stats["runs"] + again["runs"], rechecked=True)
+
+def compare(results, baseline, threshold):
+    """Cases whose fastest run slowed down by more than allowed_slowdown() vs the baseline."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        change = slowdown(stats, base)
+        if change > allowed_slowdown(stats, base, threshold):
+            regressions.append((name, base["min_s"], stats["min_s"], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the processing and dataset paths.')
+    parser.add_argument('--dir', default='DataSet', help='Dataset used to build the fixture (default: DataSet)')
+    parser.add_argument('--out', default='bench_results.json', help='Results file (default: bench_results.json)')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='Baseline file (default: bench_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Minimum slowdown flagged; raised to the measured noise (default: 0.15)')
+    parser.add_argument('--repeat', type=int, default=15, help='Timed runs per case (default: 15)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic data (default: 0)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with status 1 on regressions (only meaningful against a baseline from this machine)')
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.save_baseline:
+        if not os.path.isfile(args.baseline):
+            print(f"Error: No baseline at {args.baseline}; run with --save-baseline to create one.")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        meta = stored.get("meta", {})
+        print(f"Comparing against {args.baseline} (recorded {meta.get('date', '?')} on {meta.get('machine', '?')}, "
+              f"python {meta.get('python', '?')}, numpy {meta.get('numpy', '?')}); absolute timings only "
+              f"compare on the machine that recorded them")
+
+    results = run_benchmarks(args.dir, args.repeat, args.seed)
+    for _ in range(RECHECKS if baseline is not None else 0):
+        # Re-measure flagged cases after the full pass, so a burst of load on the machine
+        # during one case doesn't show up as a regression
+        flagged = {name for name, *_ in compare(results, baseline, args.threshold)}
+        if not flagged:
+            break
+        print(f"Re-measuring {len(flagged)} case(s) that look slower than the baseline")
+        again = run_benchmarks(args.dir, args.repeat * 3, args.seed, only=flagged)
+        for name in flagged:
+            results[name] = merge(results[name], again[name])
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n===== Benchmark Results (fastest run, spread) =====")
+    for name, stats in results.items():
+        recheck = ", re-measured" if stats.get("rechecked") else ""
+        print(f"{name}: {stats['min_s'] * 1e3:.3f} ms (+{stats['spread']:.0%}{recheck})")
+    print(f"\nWrote results to {args.out}")
+
+    if args.save_baseline:
+        shutil.copy(args.out, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"\nNot in the baseline (not compared): {', '.join(missing)}")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n===== Regressions (slower than the larger of {args.threshold:.0%} and the measured noise) =====")
+        print("(changes are relative to the reference workload timed next to each case)")
+        for name, before, after, change in regressions:
+            allowed = allowed_slowdown(results[name], baseline[name], args.threshold)
+            print(f"{name}: {before * 1e3:.3f} ms -> {after * 1e3:.3f} ms (+{change:.0%}, allowed +{allowed:.0%})")
+        if args.fail_on_regression:
+            sys.exit(1)
+        print("Not failing: pass --fail-on-regression to gate on a baseline recorded on this machine")
+        return
+    print(f"\nNo regressions beyond {args.threshold:.0%} or the measured noise against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
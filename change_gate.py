@@ -0,0 +1,143 @@
+'''
+   change_gate.py
+   Change-triggered frame storage. A frame is kept when
+       - its spectrum differs from the last kept frame by more than threshold_db (RMS or
+         maximum dB difference over the band, computed into preallocated buffers), or
+       - the peak range changed by more than range_tol (or appeared/disappeared), or
+       - heartbeat_s has passed since the last kept frame,
+   and skipped otherwise. The gate counts kept and skipped frames per reason, so the
+   reduction can be reported and skipped frames accounted for.
+
+   Enabled in FMCW_Bulk_Data_Export.py with change_gate_db; applies to the session
+   export and to continuous segments alike.
+
+   Estimate the reduction on stored sessions:
+       python3 change_gate.py --dir DataSet --threshold 6.0 --heartbeat 1.0
+'''
+
+import argparse
+import numpy as np
+
+class ChangeGate:
+    """ Decides per frame whether it is different enough from the last kept frame to store
+    Args:
+        threshold_db (float): Spectrum distance (dB) above which a frame is kept
+        range_tol (float): Peak range change (m) above which a frame is kept
+        heartbeat_s (float): Maximum time between kept frames, None for no heartbeat
+        metric (str): 'rms' or 'max' dB difference over the compared bins
+        band (slice): Bins compared, None for all
+    """
+    def __init__(self, threshold_db=6.0, range_tol=0.05, heartbeat_s=1.0, metric='rms', band=None):
+        if metric not in ('rms', 'max'):
+            raise ValueError(f"Unknown metric '{metric}'")
+        self.threshold_db = threshold_db
+        self.range_tol = range_tol
+        self.heartbeat_s = heartbeat_s
+        self.metric = metric
+        self.band = band if band is not None else slice(None)
+        self.last_spectrum = None
+        self._diff = None
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.kept = 0
+        self.skipped = 0
+        self.reasons = {"first": 0, "spectrum": 0, "range": 0, "heartbeat": 0}
+
+    def distance(self, s_dbfs):
+        """ Distance (dB) between s_dbfs and the last kept frame over the band """
+        np.subtract(s_dbfs[self.band], self.last_spectrum, out=self._diff)
+        if self.metric == 'max':
+            np.abs(self._diff, out=self._diff)
+            return float(self._diff.max())
+        return float(np.sqrt(np.dot(self._diff, self._diff) / len(self._diff)))
+
+    def range_changed(self, peak_range):
+        if (peak_range is None) != (self.last_range is None):
+            return True
+        return peak_range is not None and abs(peak_range - self.last_range) > self.range_tol
+
+    def reason(self, timestamp, s_dbfs, peak_range):
+        """ Why the frame would be kept ('first', 'range', 'spectrum', 'heartbeat'), None to skip it """
+        if self.last_spectrum is None:
+            return "first"
+        if self.range_changed(peak_range):
+            return "range"
+        if self.distance(s_dbfs) > self.threshold_db:
+            return "spectrum"
+        if self.heartbeat_s is not None and timestamp - self.last_time >= self.heartbeat_s:
+            return "heartbeat"
+        return None
+
+    def keep(self, timestamp, s_dbfs, peak_range=None):
+        """ Checks one frame and, if it is kept, makes it the new reference
+        Args:
+            timestamp (float): Frame time (s)
+            s_dbfs (np.array): Spectrum (dBFS)
+            peak_range (float): Peak range (m), None where none
+        Returns:
+            bool: True if the frame should be stored
+        """
+        reason = self.reason(timestamp, s_dbfs, peak_range)
+        if reason is None:
+            self.skipped += 1
+            return False
+        if self.last_spectrum is None:
+            self.last_spectrum = np.array(s_dbfs[self.band], dtype=np.float64)
+            self._diff = np.empty_like(self.last_spectrum)
+        else:
+            self.last_spectrum[:] = s_dbfs[self.band]
+        self.last_time = timestamp
+        self.last_range = peak_range
+        self.kept += 1
+        self.reasons[reason] += 1
+        return True
+
+    def summary_text(self):
+        total = self.kept + self.skipped
+        fraction = self.kept / total if total else 0
+        reasons = ", ".join(f"{k} {v}" for k, v in self.reasons.items())
+        return f"Kept {self.kept} of {total} frames ({fraction:.1%}), skipped {self.skipped} ({reasons})"
+
+def keep_mask(times, magnitudes, ranges, **gate_args):
+    """ Frames of a stored session the gate would keep
+    Args:
+        times (np.array): Frame times (s)
+        magnitudes (np.array): (frames, bins) dBFS
+        ranges (np.array): Peak range per frame, NaN where none
+    Returns:
+        tuple: (bool mask over frames, the ChangeGate with its counters)
+    """
+    gate = ChangeGate(**gate_args)
+    mask = np.zeros(len(times), dtype=bool)
+    for i, (t, frame, r) in enumerate(zip(times, magnitudes, ranges)):
+        mask[i] = gate.keep(t, frame, None if np.isnan(r) else float(r))
+    return mask, gate
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate how many frames change-triggered storage keeps.')
+    parser.add_argument('--dir', default='DataSet', help='Dataset directory (default: DataSet)')
+    parser.add_argument('--threshold', type=float, default=6.0, help='Spectrum distance in dB (default: 6.0)')
+    parser.add_argument('--range-tol', type=float, default=0.05, help='Peak range change in m (default: 0.05)')
+    parser.add_argument('--heartbeat', type=float, default=1.0, help='Maximum seconds between kept frames (default: 1.0)')
+    parser.add_argument('--metric', choices=['rms', 'max'], default='rms', help='Spectrum distance metric (default: rms)')
+    args = parser.parse_args()
+
+    from dataset_io import iter_filtered_csvs, load_filtered_csv
+    totals = {}
+    for bin_dir, csv_path in iter_filtered_csvs(args.dir):
+        times, _, magnitudes, ranges = load_filtered_csv(csv_path)
+        mask, _ = keep_mask(times, magnitudes, ranges, threshold_db=args.threshold, range_tol=args.range_tol,
+                            heartbeat_s=args.heartbeat, metric=args.metric)
+        kept, total = totals.get(bin_dir, (0, 0))
+        totals[bin_dir] = (kept + int(mask.sum()), total + len(mask))
+    print(f"{'bin':<12} {'kept':>8} {'frames':>8} {'fraction':>9}")
+    for bin_dir, (kept, total) in sorted(totals.items()):
+        print(f"{bin_dir:<12} {kept:>8} {total:>8} {kept / total:>9.1%}")
+    kept = sum(k for k, _ in totals.values())
+    total = sum(t for _, t in totals.values())
+    if total:
+        print(f"{'all':<12} {kept:>8} {total:>8} {kept / total:>9.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+'''
+   clutter_map.py
+   Per-bin background (clutter) map for removing static reflections before CFAR and the
+   peak search. The map is an exponentially weighted average of the frame power in
+   each bin; subtraction is done in linear power and converted back to dBFS. All
+   per-frame work writes into buffers allocated once, so the live loop doesn't allocate.
+
+   Modes in FMCW_Bulk_Data_Export.py (clutter_mode):
+       "calibrate"  average every frame of an empty scene into the map and save it to
+                    clutter_map_path when the program ends
+       "subtract"   load clutter_map_path and subtract it from every frame; with
+                    clutter_alpha > 0 the map also keeps adapting (a static target will
+                    fade into it over roughly 1/alpha frames)
+
+   A map loaded onto a different frequency axis is interpolated inside its calibration
+   band and is zero (no subtraction) outside it.
+
+   Batch use on stored sessions (--holdout leaves the newest fraction of the empty-scene
+   recording sessions, all of their files, out of the map; --evaluate skips every file
+   of the sessions a map was built from):
+       python3 clutter_map.py --calibrate DataSet/no_object --holdout 0.5 --out clutter_map.npz
+       python3 clutter_map.py --evaluate clutter_map.npz --dir DataSet
+'''
+
+import argparse
+import os
+import numpy as np
+
+POWER_FLOOR = 1e-20   # -200 dBFS, the value CFAR fills masked cells with
+
+class ClutterMap:
+    """ EWMA background per frequency bin
+    Args:
+        freq (np.array): Frequency of each bin (kept so a saved map can be matched to other axes)
+        alpha (float): EWMA weight of the newest frame
+    """
+    def __init__(self, freq, alpha=0.05):
+        self.freq = np.asarray(freq, dtype=np.float64).copy()
+        self.alpha = alpha
+        num_bins = len(self.freq)
+        self.background = np.zeros(num_bins)     # linear power
+        self.frames = 0
+        self.sources = []                        # recording sessions the map was calibrated on
+        self._power = np.empty(num_bins)
+        self._work = np.empty(num_bins)
+        self._clean = np.empty(num_bins)
+
+    def _to_power(self, s_dbfs):
+        np.divide(s_dbfs, 10, out=self._power)
+        np.power(10, self._power, out=self._power)
+        return self._power
+
+    def update(self, s_dbfs, alpha=None):
+        """ Folds one frame into the map in place. alpha=0 gives the cumulative mean (calibration). """
+        power = self._to_power(s_dbfs)
+        if self.frames == 0:
+            self.background[:] = power
+        else:
+            weight = alpha if alpha is not None else self.alpha
+            if weight == 0:
+                weight = 1 / (self.frames + 1)
+            np.subtract(power, self.background, out=self._work)
+            self._work *= weight
+            self.background += self._work
+        self.frames += 1
+
+    def subtract(self, s_dbfs):
+        """ Background-subtracted spectrum in dBFS
+        Returns:
+            np.array: An internal buffer, overwritten by the next call
+        """
+        power = self._to_power(s_dbfs)
+        np.subtract(power, self.background, out=self._clean)
+        np.maximum(self._clean, POWER_FLOOR, out=self._clean)
+        np.log10(self._clean, out=self._clean)
+        self._clean *= 10
+        return self._clean
+
+    def process(self, s_dbfs, adapt=True):
+        """ Subtracts the current map from the frame, then (if adapt) updates the map with it """
+        clean = self.subtract(s_dbfs)
+        if adapt and self.alpha > 0:
+            self.update(s_dbfs)
+        return clean
+
+    def background_dbfs(self, freq=None):
+        """ The map in dBFS, interpolated onto freq if given (POWER_FLOOR outside the map's band) """
+        background = 10 * np.log10(np.maximum(self.background, POWER_FLOOR))
+        if freq is None:
+            return background
+        floor = 10 * np.log10(POWER_FLOOR)
+        return np.interp(freq, self.freq, background, left=floor, right=floor)
+
+    def save(self, path):
+        np.savez(path, freq=self.freq, background=self.background, alpha=self.alpha, frames=self.frames,
+                 sources=np.array(self.sources, dtype=str))
+
+    @classmethod
+    def load(cls, path, freq=None):
+        """ Reads a saved map; if freq is given the map is moved onto that axis, with no
+        subtraction in bins outside the calibrated band """
+        with np.load(path) as data:
+            clutter = cls(data["freq"], float(data["alpha"]))
+            clutter.background[:] = data["background"]
+            clutter.frames = int(data["frames"])
+            clutter.sources = list(data["sources"]) if "sources" in data else []
+        if freq is not None and not np.array_equal(np.asarray(freq), clutter.freq):
+            freq = np.asarray(freq)
+            half_bin = np.median(np.diff(clutter.freq)) / 2 if len(clutter.freq) > 1 else 0
+            inside = (freq >= clutter.freq[0] - half_bin) & (freq <= clutter.freq[-1] + half_bin)
+            moved = cls(freq, clutter.alpha)
+            moved.background[inside] = np.interp(freq[inside], clutter.freq, clutter.background)   # zero elsewhere
+            moved.frames, moved.sources = clutter.frames, clutter.sources
+            clutter = moved
+        return clutter
+
+def subtract_batch(magnitudes, background_dbfs):
+    """ Subtracts a fixed background (bins,) from stacked frames (..., bins), all in dBFS """
+    power = 10 ** (np.asarray(magnitudes) / 10) - 10 ** (np.asarray(background_dbfs) / 10)
+    return 10 * np.log10(np.maximum(power, POWER_FLOOR))
+
+def running_batch(magnitudes, alpha, initial_dbfs=None):
+    """ Applies a running clutter map along the frame axis of (..., frames, bins) sessions
+    Each frame has the map built from the frames before it subtracted, as in the live loop.
+    Returns:
+        np.array: Background-subtracted magnitudes, same shape
+    """
+    power = 10 ** (np.asarray(magnitudes, dtype=np.float64) / 10)
+    clean = np.empty_like(power)
+    background = power[..., 0, :].copy() if initial_dbfs is None else np.broadcast_to(
+        10 ** (np.asarray(initial_dbfs) / 10), power[..., 0, :].shape).copy()
+    for frame in range(power.shape[-2]):
+        clean[..., frame, :] = power[..., frame, :] - background
+        background += alpha * (power[..., frame, :] - background)
+    return 10 * np.log10(np.maximum(clean, POWER_FLOOR))
+
+def session_of(path):
+    """ Recording session (mmdd-HHMMSS prefix) of a dataset file, or its name if it has none """
+    from dataset_io import parse_sample_name
+    info = parse_sample_name(path)
+    return info["session"] if info else os.path.basename(path)
+
+def split_sessions(paths, holdout):
+    """ Splits files by recording session, holding out the newest holdout fraction of sessions
+    Returns:
+        tuple: (calibration paths, held out paths, held out session names)
+    """
+    sessions = sorted({session_of(path) for path in paths})
+    held_out = set(sessions[len(sessions) - int(len(sessions) * holdout):]) if holdout > 0 else set()
+    return ([p for p in paths if session_of(p) not in held_out],
+            [p for p in paths if session_of(p) in held_out], sorted(held_out))
+
+def calibrate_from_files(paths, alpha=0.05):
+    """ Cumulative-mean clutter map over every frame of the given FilteredCSV files """
+    from dataset_io import load_filtered_csv
+    clutter = None
+    for path in paths:
+        _, freq, magnitudes, _ = load_filtered_csv(path)
+        if clutter is None:
+            clutter = ClutterMap(freq, alpha)
+        for frame in magnitudes:
+            clutter.update(frame, alpha=0)
+        if session_of(path) not in clutter.sources:
+            clutter.sources.append(session_of(path))
+    return clutter
+
+def evaluate(map_path, base_dir="DataSet"):
+    """ Per-bin accuracy of the default peak settings with and without the map, scored only
+    on sessions the map was not calibrated on """
+    from dataset_io import load_dataset
+    from parameter_sweep import bin_accuracy, peak_ranges
+    dataset = load_dataset(base_dir)
+    clutter = ClutterMap.load(map_path, dataset["freq"])
+    cleaned = subtract_batch(dataset["magnitudes"], clutter.background_dbfs())
+    params = {"range_threshold": -20, "freq_offset": 25e3, "binmin": 0, "binmax": 89 * 2.54 / 100,
+              "use_cfar": False, "cfar_bias": 25, "cfar_guard": 15, "cfar_ref": 16}
+    bin_dirs = np.array(dataset["bin_dirs"])
+    calibrated = {session_of(source) for source in clutter.sources}   # older maps stored file names
+    held_out = np.array([session_of(path) not in calibrated for path in dataset["paths"]])
+    print(f"{'bin':<12} {'files':>6} {'raw':>8} {'clutter removed':>16}")
+    for bin_dir in sorted(set(dataset["bin_dirs"])):
+        files = (bin_dirs == bin_dir) & held_out
+        if not files.any():
+            print(f"{bin_dir:<12} {0:>6} {'n/a (all used for calibration)':>25}")
+            continue
+        frames = dataset["magnitudes"][files].reshape(-1, len(dataset["freq"]))
+        raw = bin_accuracy(peak_ranges(frames, dataset["freq"], params), bin_dir)
+        clean = bin_accuracy(peak_ranges(cleaned[files].reshape(frames.shape), dataset["freq"], params), bin_dir)
+        print(f"{bin_dir:<12} {int(files.sum()):>6} {raw:>8.3f} {clean:>16.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or evaluate a clutter map from stored sessions.')
+    parser.add_argument('--calibrate', metavar='BIN_DIR', help='Build a map from the FilteredCSV files of an empty-scene bin')
+    parser.add_argument('--out', default='clutter_map.npz', help='Map written by --calibrate (default: clutter_map.npz)')
+    parser.add_argument('--alpha', type=float, default=0.05, help='EWMA weight stored with the map (default: 0.05)')
+    parser.add_argument('--holdout', type=float, default=0.0,
+                        help='Fraction of the newest recording sessions left out of the map for --evaluate (default: 0)')
+    parser.add_argument('--evaluate', metavar='MAP', help='Compare per-bin accuracy with and without MAP')
+    parser.add_argument('--dir', default='DataSet', help='Dataset for --evaluate (default: DataSet)')
+    args = parser.parse_args()
+
+    if args.calibrate:
+        import glob
+        paths = sorted(glob.glob(os.path.join(args.calibrate, "FilteredCSV", "*.csv")))
+        if not paths:
+            print(f"No FilteredCSV files in {args.calibrate}")
+            return
+        calibration, held_out, held_sessions = split_sessions(paths, args.holdout)
+        if not calibration:
+            print(f"--holdout {args.holdout} leaves no sessions to calibrate on")
+            return
+        if args.holdout > 0 and not held_sessions:
+            print(f"Only {len({session_of(path) for path in calibration})} recording session(s) in "
+                  f"{args.calibrate}; none can be held out")
+        clutter = calibrate_from_files(calibration, args.alpha)
+        clutter.save(args.out)
+        print(f"Saved clutter map from {clutter.frames} frames of {len(clutter.sources)} session(s) "
+              f"({len(calibration)} files) to {args.out}; held out {len(held_sessions)} session(s) "
+              f"({len(held_out)} files)")
+    if args.evaluate:
+        evaluate(args.evaluate, args.dir)
+    if not args.calibrate and not args.evaluate:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+'''
+   compact_storage.py
+   Compact alternative to the session CSV files. One .npz holds:
+       freq        float64 (bins)           shared frequency axis, stored once
+       magnitudes  int16   (frames, bins)   dBFS in MAG_STEP (0.01 dB) steps
+       t0_us       int64                    first frame time in microseconds
+       dt_us       int32   (frames)         time since the previous frame in microseconds
+       ranges      float32 (frames)         peak range per frame, NaN where none
+       smoothed_ranges float32 (frames)     tracker output per frame (optional)
+   Maximum reconstruction error against the full-precision values:
+       magnitude   0.005 dB (half a step) within MAG_MIN..MAG_MAX; values outside are clipped
+       time        0.5 us (times are rounded to the microsecond before delta coding, so
+                   errors do not accumulate)
+       range       float32 rounding, below 1e-7 m for ranges under 2 m
+       frequency   exact
+   A 57 x 60 session is about 9 KB uncompressed instead of roughly 225 KB of CSV text.
+
+   Convert an existing dataset (FilteredCSV/*.csv -> Compact/*.npz per bin):
+       python3 compact_storage.py --dir DataSet --workers 4 --verify
+'''
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dataset_io import iter_filtered_csvs, load_filtered_csv
+
+FORMAT_VERSION = 1
+MAG_STEP = 0.01
+MAG_MIN = np.iinfo(np.int16).min * MAG_STEP
+MAG_MAX = np.iinfo(np.int16).max * MAG_STEP
+
+def encode_frames(times, freq, magnitudes, ranges):
+    """ Quantizes one session's frames
+    Args:
+        times (np.array): Time since start of each frame (s)
+        freq (np.array): Frequency of each bin (Hz)
+        magnitudes (np.array): (frames, bins) dBFS
+        ranges (np.array): Peak range per frame (m), NaN where none
+    Returns:
+        dict: Arrays as stored in the .npz (see module docstring)
+    """
+    time_us = np.rint(np.asarray(times, dtype=np.float64) * 1e6).astype(np.int64)
+    dt_us = np.diff(time_us, prepend=time_us[:1]).astype(np.int32)
+    quantized = np.rint(np.clip(magnitudes, MAG_MIN, MAG_MAX) / MAG_STEP).astype(np.int16)
+    return {
+        "format": np.int32(FORMAT_VERSION),
+        "freq": np.asarray(freq, dtype=np.float64),
+        "magnitudes": quantized,
+        "t0_us": time_us[0] if len(time_us) else np.int64(0),
+        "dt_us": dt_us,
+        "ranges": np.asarray(ranges, dtype=np.float32),
+    }
+
+def decode_frames(arrays, smoothed=False):
+    """ Inverse of encode_frames()
+    Args:
+        smoothed (bool): Also return the smoothed ranges (None if the file has none)
+    Returns:
+        tuple: (times, freq, magnitudes, ranges) like dataset_io.load_filtered_csv(),
+            plus smoothed_ranges when smoothed is True
+    """
+    if int(arrays["format"]) != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact format {int(arrays['format'])}")
+    times = (int(arrays["t0_us"]) + np.cumsum(arrays["dt_us"], dtype=np.int64)) / 1e6
+    magnitudes = arrays["magnitudes"].astype(np.float64) * MAG_STEP
+    frames = times, arrays["freq"], magnitudes, arrays["ranges"].astype(np.float64)
+    if not smoothed:
+        return frames
+    smoothed_ranges = arrays["smoothed_ranges"].astype(np.float64) if "smoothed_ranges" in arrays else None
+    return frames + (smoothed_ranges,)
+
+def save_compact(path, times, freq, magnitudes, ranges, compress=False, smoothed_ranges=None):
+    """ Writes one session to path (.npz). compress trades encode speed for ~2x smaller files.
+    smoothed_ranges (range tracker output per frame) is stored alongside when given. """
+    arrays = encode_frames(times, freq, magnitudes, ranges)
+    if smoothed_ranges is not None:
+        arrays["smoothed_ranges"] = np.asarray(smoothed_ranges, dtype=np.float32)
+    save = np.savez_compressed if compress else np.savez
+    save(path, **arrays)
+
+def load_compact(path, smoothed=False):
+    """ Reads a file written by save_compact()
+    Returns:
+        tuple: (times, freq, magnitudes, ranges) like dataset_io.load_filtered_csv(),
+            plus smoothed_ranges (None if not stored) when smoothed is True
+    """
+    with np.load(path) as arrays:
+        return decode_frames(arrays, smoothed)
+
+def convert_file(task):
+    """ Converts one CSV to .npz. Returns (csv_path, max magnitude error or None, bytes before, bytes after). """
+    csv_path, out_path, compress, verify = task
+    times, freq, magnitudes, ranges = load_filtered_csv(csv_path)
+    tmp_path = out_path + ".tmp.npz"
+    save_compact(tmp_path, times, freq, magnitudes, ranges, compress)
+    os.replace(tmp_path, out_path)
+    max_error = None
+    if verify:
+        _, _, decoded, decoded_ranges = load_compact(out_path)
+        max_error = float(np.max(np.abs(decoded - np.clip(magnitudes, MAG_MIN, MAG_MAX))))
+        if not np.allclose(decoded_ranges, ranges, rtol=1e-6, equal_nan=True):
+            raise ValueError(f"Range mismatch after round trip in {csv_path}")
+    return csv_path, max_error, os.path.getsize(csv_path), os.path.getsize(out_path)
+
+def convert_dataset(base_dir="DataSet", out_name="Compact", workers=None, compress=False, verify=False, overwrite=False):
+    """ Converts every FilteredCSV file to <bin>/<out_name>/<name>.npz in parallel
+    Returns:
+        dict: files converted, skipped, bytes before/after and the largest magnitude error seen
+    """
+    tasks, skipped = [], 0
+    for bin_dir, csv_path in iter_filtered_csvs(base_dir):
+        out_dir = os.path.join(base_dir, bin_dir, out_name)
+        os.makedirs(out_dir, exist_ok=True)
+        out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(csv_path))[0] + ".npz")
+        if not overwrite and os.path.exists(out_path):
+            skipped += 1
+            continue
+        tasks.append((csv_path, out_path, compress, verify))
+
+    summary = {"converted": 0, "skipped": skipped, "bytes_before": 0, "bytes_after": 0, "max_error_db": 0.0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for csv_path, max_error, before, after in executor.map(convert_file, tasks, chunksize=16):
+            summary["converted"] += 1
+            summary["bytes_before"] += before
+            summary["bytes_after"] += after
+            if max_error is not None:
+                summary["max_error_db"] = max(summary["max_error_db"], max_error)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert FilteredCSV files to the compact quantized format.')
+    parser.add_argument('--dir', default='DataSet', help='Dataset directory (default: DataSet)')
+    parser.add_argument('--out-name', default='Compact', help='Output folder name inside each bin (default: Compact)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--compress', action='store_true', help='zlib-compress the .npz files')
+    parser.add_argument('--verify', action='store_true', help='Decode each file again and report the largest error')
+    parser.add_argument('--overwrite', action='store_true', help='Rewrite files that already exist')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = convert_dataset(args.dir, args.out_name, args.workers, args.compress, args.verify, args.overwrite)
+    elapsed = time.perf_counter() - start
+    print(f"Converted {summary['converted']} files ({summary['skipped']} already done) in {elapsed:.1f} s")
+    if summary["converted"]:
+        print(f"Size: {summary['bytes_before'] / 1e6:.1f} MB -> {summary['bytes_after'] / 1e6:.1f} MB")
+    if args.verify:
+        print(f"Largest magnitude error: {summary['max_error_db']:.4f} dB (bound {MAG_STEP / 2} dB)")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,10 @@
 import os
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as font_manager
 import re
 from collections import defaultdict
 
-plt.rcParams['font.family']='serif'
-# cmfont = font_manager.FontProperties(fname='cmunrm.ttf')
-# plt.rcParams['font.serif']=cmfont.get_name()
+# pandas and matplotlib are imported inside the functions that use them, so
+# importing this module (e.g. for parse_bin_range) stays cheap
 
 def parse_bin_range(bin_name):
     """Extract the min and max values from a bin range string and adjust by 0.01m"""
@@ -22,6 +18,7 @@ def parse_bin_range(bin_name):
 
 def analyze_dataset(base_dir="DataSet"):
     """Analyze all bins in the dataset for accuracy."""
+    import pandas as pd
     results = []
     
     # Check if base directory exists
@@ -93,6 +90,11 @@ def create_distribution_charts(results, output_dir="accuracy_plots"):
     """Create distribution charts for each bin"""
     if not results:
         return
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.family']='serif'
+    # import matplotlib.font_manager as font_manager
+    # cmfont = font_manager.FontProperties(fname='cmunrm.ttf')
+    # plt.rcParams['font.serif']=cmfont.get_name()
         
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
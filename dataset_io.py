@@ -0,0 +1,123 @@
+'''
+   dataset_io.py
+   Helpers for walking the DataSet tree and loading the FilteredCSV files
+   written by FMCW_Bulk_Data_Export.py into NumPy arrays.
+'''
+
+import os
+import re
+import numpy as np
+
+# e.g. 0318-133408_truedist0.368_calcdist0.340_bin0.37-0.52m_img1.csv
+SAMPLE_NAME_PATTERN = re.compile(
+    r'^(?P<session>\d{4}-\d{6})_truedist(?P<truedist>-?\d+\.\d+)'
+    r'_calcdist(?P<calcdist>-?\d+\.\d+)_bin(?P<bin>.+?)m_img(?P<img>\d+)\.(?P<ext>\w+)$')
+
+CSV_HEADER = ["Time Since Start (s)", "Frequency (Hz)", "Magnitude (dBFS)", "Range (m)"]
+
+def parse_sample_name(file_name):
+    """Extract the metadata encoded in a dataset file name.
+
+    Args:
+        file_name (str): Base name of a FilteredCSV or Images file
+    Returns:
+        dict: session, truedist, calcdist, bin, img and ext, or None if the name does not match
+    """
+    match = SAMPLE_NAME_PATTERN.match(os.path.basename(file_name))
+    if not match:
+        return None
+    info = match.groupdict()
+    info["truedist"] = float(info["truedist"])
+    info["calcdist"] = float(info["calcdist"])
+    info["img"] = int(info["img"])
+    return info
+
+def list_bin_dirs(base_dir="DataSet"):
+    """Return the sorted range bin directory names under base_dir."""
+    if not os.path.exists(base_dir):
+        print(f"Error: Directory '{base_dir}' not found.")
+        return []
+    return sorted(d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d)))
+
+def iter_filtered_csvs(base_dir="DataSet"):
+    """Yield (bin_dir, csv_path) for every FilteredCSV file in the dataset."""
+    for bin_dir in list_bin_dirs(base_dir):
+        filtered_csv_path = os.path.join(base_dir, bin_dir, "FilteredCSV")
+        if not os.path.exists(filtered_csv_path):
+            print(f"Warning: No FilteredCSV directory found in {os.path.join(base_dir, bin_dir)}")
+            continue
+        for csv_file in sorted(f for f in os.listdir(filtered_csv_path) if f.endswith('.csv')):
+            yield bin_dir, os.path.join(filtered_csv_path, csv_file)
+
+def load_filtered_rows(file_path):
+    """Load the rows of one FilteredCSV file grouped by frame.
+
+    Returns:
+        np.array: (frames, bins, columns) with empty Range cells as NaN
+    """
+    rows = np.genfromtxt(file_path, delimiter=',', skip_header=1, ndmin=2)
+    if rows.size == 0:
+        raise ValueError(f"No data rows in {file_path}")
+    num_frames = len(np.unique(rows[:, 0]))
+    if len(rows) % num_frames:
+        raise ValueError(f"Ragged frames in {file_path}: {len(rows)} rows for {num_frames} frames")
+    num_bins = len(rows) // num_frames
+    # Rows are written frame by frame, so the file reshapes directly
+    return rows.reshape(num_frames, num_bins, rows.shape[1])
+
+def load_filtered_csv(file_path):
+    """Load one FilteredCSV file as a frames x bins magnitude matrix.
+
+    Args:
+        file_path (str): Path to the CSV file
+    Returns:
+        tuple: (times, freq, magnitudes, ranges) where times and ranges have one entry
+            per frame (NaN where no peak was found), freq has one entry per bin and
+            magnitudes is shaped (frames, bins)
+    """
+    rows = load_filtered_rows(file_path)
+    num_frames = rows.shape[0]
+    freq = rows[0, :, 1]
+    magnitudes = rows[:, :, 2]
+    ranges = rows[:, 0, 3] if rows.shape[2] > 3 else np.full(num_frames, np.nan)
+    return rows[:, 0, 0], freq, magnitudes, ranges
+
+def load_dataset(base_dir="DataSet"):
+    """Load every FilteredCSV file in the dataset into stacked arrays.
+
+    Files whose frames x bins shape or frequency axis differ from the first file
+    are reported and skipped so the result can be a single dense array.
+
+    Returns:
+        dict: freq (bins,), magnitudes (files, frames, bins), ranges (files, frames),
+            times (files, frames), bin_dirs and paths (one entry per file)
+    """
+    freq = None
+    magnitudes, ranges, times, bin_dirs, paths = [], [], [], [], []
+    for bin_dir, file_path in iter_filtered_csvs(base_dir):
+        try:
+            t, f, mags, rngs = load_filtered_csv(file_path)
+        except Exception as e:
+            print(f"Error processing {file_path}: {e}")
+            continue
+        if freq is None:
+            freq = f
+        elif mags.shape != magnitudes[0].shape or not np.allclose(f, freq):
+            print(f"Warning: {file_path} has shape {mags.shape}, expected {magnitudes[0].shape}; skipping")
+            continue
+        magnitudes.append(mags)
+        ranges.append(rngs)
+        times.append(t)
+        bin_dirs.append(bin_dir)
+        paths.append(file_path)
+
+    if freq is None:
+        return None
+    return {
+        "freq": freq,
+        "magnitudes": np.stack(magnitudes),
+        "ranges": np.stack(ranges),
+        "times": np.stack(times),
+        "bin_dirs": bin_dirs,
+        "paths": paths,
+    }
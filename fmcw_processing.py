@@ -0,0 +1,267 @@
+'''
+   fmcw_processing.py
+   Per-frame signal processing and session export used by FMCW_Bulk_Data_Export.py,
+   kept free of hardware and GUI code so offline tools and benchmarks can import it.
+   OpenCV is only imported when images are actually written.
+'''
+
+import csv
+import os
+from collections import defaultdict
+import numpy as np
+from compact_storage import save_compact
+from imaging import magnitudes_to_image
+from target_detection_dbfs import find_peaks_batch
+from windowing import sliding_windows, window_modes
+
+def compute_spectrum(sum_data, fft_size, start_offset_samples, good_ramp_samples,
+                     num_chirps=1, num_samples_frame=0, win_funct=None):
+    """ Computes the dBFS spectrum of the last chirp in a receive buffer
+    Args:
+        sum_data (np.array): Complex samples (Rx1 + Rx2) from my_sdr.rx(), or a (..., samples)
+            stack of buffers that are transformed in one batched FFT
+        fft_size (int): FFT length
+        start_offset_samples (int): Samples skipped at the start of each chirp
+        good_ramp_samples (int): Samples taken from the linear part of each chirp
+        num_chirps (int): Chirps per buffer; only the last one is transformed
+        num_samples_frame (int): Samples between chirp starts
+        win_funct (np.array): Window applied to the chirp samples, rectangular if None
+    Returns:
+        np.array: fftshift-ed magnitude spectrum in dBFS, fft_size points (per buffer)
+    """
+    # select just the linear portion of the last chirp
+    start_index = start_offset_samples + (num_chirps-1)*num_samples_frame
+    stop_index = start_index + good_ramp_samples
+    if win_funct is None:
+        win_funct = np.ones(good_ramp_samples)
+    sum_data = np.asarray(sum_data)
+    burst_data = np.ones(sum_data.shape[:-1] + (fft_size,), dtype=complex)*1e-10
+    burst_data[..., start_offset_samples:(start_offset_samples+good_ramp_samples)] = sum_data[..., start_index:stop_index]*win_funct
+
+    sp = np.absolute(np.fft.fft(burst_data, axis=-1))
+    sp = np.fft.fftshift(sp, axes=-1)
+    s_mag = np.abs(sp) / np.sum(win_funct)
+    s_mag = np.maximum(s_mag, 10 ** (-15))
+    s_dbfs = 20 * np.log10(s_mag / (2 ** 11))
+    return s_dbfs
+
+def range_to_freq(distance, slope, ref_freq, c=3e8):
+    """ Beat frequency of a target at distance (m); ref_freq is the zero-range
+    frequency (signal_freq + freq_offset) """
+    return (distance * 2 * slope / c) + ref_freq
+
+def freq_to_range(frequency, slope, ref_freq, c=3e8):
+    """ Target distance (m) for a beat frequency; inverse of range_to_freq() """
+    return (frequency - ref_freq) * c / (2 * slope)
+
+def find_strongest_peak(frequencies, magnitudes, min_freq, max_freq):
+    """
+    Find the strongest peak within a specific frequency range.
+    
+    Args:
+        frequencies: Array of frequencies
+        magnitudes: Array of magnitude values
+        min_freq: Minimum frequency to consider
+        max_freq: Maximum frequency to consider
+        
+    Returns:
+        tuple: (peak_frequency, peak_magnitude) or (None, None) if no peak found
+    """
+    _, peak_freqs, _, peak_mags = find_peaks_batch(frequencies, magnitudes, min_freq, max_freq)
+    if np.isnan(peak_mags[0, 0]):
+        return None, None
+    return peak_freqs[0, 0], peak_mags[0, 0]
+
+def export_session(data_list, start_time, image_path, file_path, fft_size, lower_freq, upper_freq,
+                   img_size, num_img, true_dist, measure_distance, window_stride=None, compact=False):
+    """ Exports one session's stored frames to a CSV file and dataset images
+    Args:
+        data_list (list): Rows of [time_since_start, frequency, magnitude, peak_range(, smoothed_range)]
+            from store_data()
+        start_time (datetime): Session start, used for the file name timestamp
+        image_path, file_path (str): Output directories for the images and the CSV
+        fft_size (int): FFT size, used in the CSV file name
+        lower_freq, upper_freq (float): Frequency band kept in the export (widened by 1.35x)
+        img_size (int): Image width/height and frames per image
+        num_img (int): Number of non-overlapping images to export when window_stride is None
+        true_dist (float): Measured target distance (m) for the file names
+        measure_distance (str): Bin label for the file names
+        window_stride (int): Frames between overlapping image windows, None for non-overlapping chunks
+        compact (bool): Write the frames as a quantized .npz (see compact_storage.py) instead of the CSV
+    Returns:
+        None
+    """
+    import cv2 # type: ignore
+    filtered_data = defaultdict(list)
+
+    if not os.path.exists(image_path):
+        os.makedirs(image_path)
+    if not os.path.exists(file_path):
+        os.makedirs(file_path)
+        
+    for row in data_list:
+        t_since_start = float(row[0])
+        frequency = float(row[1])
+        if lower_freq/1.35 < frequency < upper_freq*1.35:
+            filtered_data[t_since_start].append(row)
+    
+    num_samples = len(filtered_data.keys())
+    
+    st = start_time.strftime("%m%d-%H%M%S")  # Format start_time as mmdd-hhmmss
+    if not compact:
+        filename = f"{file_path}/{st}_{fft_size}x{num_samples}.csv"  # Create filename
+        file_exists = os.path.isfile(filename)  # Check if file exists
+
+        with open(filename, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                header = [ "Time Since Start (s)", "Frequency (Hz)", "Magnitude (dBFS)", "Range (m)"]
+                if data_list and len(data_list[0]) > 4:
+                    header.append("Smoothed Range (m)")
+                writer.writerow(header)
+            for time_since_start in sorted(filtered_data.keys()):
+                for row in filtered_data[time_since_start]:
+                    writer.writerow(row)
+        print(f"Exported data to {filename}")
+    
+    image_data = defaultdict(list)
+    ranges_per_time = defaultdict(list)
+    smoothed_per_time = {}
+    
+    for time_since_start in sorted(filtered_data.keys()):
+        for row in filtered_data[time_since_start]:
+            t_since_start = float(row[0])
+            magnitude = float(row[2])
+            if (len(row) > 3) and row[3] is not None:
+                ranges_per_time[t_since_start].append(float(row[3]))
+            if len(row) > 4:
+                smoothed_per_time[t_since_start] = np.nan if row[4] is None else float(row[4])
+            image_data[t_since_start].append(magnitude)
+    
+    sorted_times = sorted(image_data.keys())
+    magnitudes = np.array([image_data[t] for t in sorted_times])
+    frame_ranges = np.array([ranges_per_time[t][0] if ranges_per_time[t] else np.nan for t in sorted_times])
+
+    if compact:
+        filename = f"{file_path}/{st}_{fft_size}x{num_samples}.npz"
+        band_freq = [float(row[1]) for row in filtered_data[sorted_times[0]]] if sorted_times else []
+        smoothed_ranges = [smoothed_per_time[t] for t in sorted_times] if smoothed_per_time else None
+        save_compact(filename, sorted_times, band_freq, magnitudes, frame_ranges, smoothed_ranges=smoothed_ranges)
+        print(f"Exported data to {filename}")
+
+    if window_stride is None:
+        if len(sorted_times) < (img_size+1)*num_img:
+            print(f"Warning: Not enough samples for {num_img}. Have {len(sorted_times)} samples, need {(img_size+1) * num_img}")
+        # Non-overlapping chunks of img_size frames, skipping the first time sample
+        first_frame, stride = 1, img_size
+    else:
+        first_frame, stride = 0, window_stride
+
+    # Windows are views into magnitudes; nothing is copied until an image is rendered
+    windows = sliding_windows(magnitudes[first_frame:], img_size, stride)
+    calc_dists = window_modes(frame_ranges[first_frame:], img_size, stride)
+    if window_stride is None:
+        if len(windows) < num_img:
+            print(f"Not enough data for image {len(windows)+1}, stopping at image {len(windows)}")
+        windows, calc_dists = windows[:num_img], calc_dists[:num_img]
+
+    # Generate multiple images
+    for img_idx, (chunk, calc_dist) in enumerate(zip(windows, calc_dists)):
+        image_file_name = f"{image_path}/{st}_truedist{true_dist:.3f}_calcdist{calc_dist:.3f}_bin{measure_distance}m_img{img_idx+1}.png"
+        
+        # Scale, downsample, flip and colorize this chunk of frames, then save the image
+        colored_image = magnitudes_to_image(chunk, img_size)
+        cv2.imwrite(image_file_name, colored_image)
+        
+        print(f"Exported image {img_idx+1} to {image_file_name}")
+
+class SessionWriter:
+    """ Incremental version of export_session() for one session
+    Band rows of every frame are appended to the CSV as they arrive and each image is
+    written as soon as its window of frames is complete, so only the band magnitudes
+    (frames x band bins) are held in memory. The CSV is written as <name>.partial and
+    renamed to the usual {st}_{fft_size}x{frames}.csv by close(). Produces the same
+    files as export_session() for the same frames.
+    Args:
+        freq (np.array): Frequency of each FFT bin
+        max_frames (int): Frames kept at most (sizes the band arrays); later frames are
+            dropped with a warning and counted in .dropped
+        Others as in export_session()
+    """
+    def __init__(self, start_time, image_path, file_path, fft_size, freq, lower_freq, upper_freq,
+                 img_size, num_img, true_dist, measure_distance, max_frames, window_stride=None, compact=False):
+        os.makedirs(image_path, exist_ok=True)
+        os.makedirs(file_path, exist_ok=True)
+        self.image_path, self.file_path, self.fft_size = image_path, file_path, fft_size
+        self.img_size, self.num_img, self.window_stride, self.compact = img_size, num_img, window_stride, compact
+        self.true_dist, self.measure_distance = true_dist, measure_distance
+        self.st = start_time.strftime("%m%d-%H%M%S")
+        freq = np.asarray(freq)
+        self.band = (freq > lower_freq/1.35) & (freq < upper_freq*1.35)
+        self.band_freq = freq[self.band]
+        self.times = np.empty(max_frames)
+        self.magnitudes = np.empty((max_frames, len(self.band_freq)))
+        self.ranges = np.empty(max_frames)
+        self.count = 0
+        self.dropped = 0
+        self.images = 0
+        # Non-overlapping chunks skip the first time sample, as in export_session()
+        self.first_frame, self.stride = (1, img_size) if window_stride is None else (0, window_stride)
+        self.csv_file = self.writer = None
+        if not compact:
+            self.partial_path = f"{file_path}/{self.st}_{fft_size}.partial"
+            self.csv_file = open(self.partial_path, mode='w', newline='')
+            self.writer = csv.writer(self.csv_file)
+            self.writer.writerow(["Time Since Start (s)", "Frequency (Hz)", "Magnitude (dBFS)", "Range (m)"])
+
+    def append(self, time_since_start, s_dbfs, peak_range):
+        """ Adds one frame: writes its band rows and any image whose window it completes
+        Returns:
+            bool: False if the writer is full (max_frames reached) and the frame was dropped
+        """
+        i = self.count
+        if i == len(self.times):
+            if not self.dropped:
+                print(f"Warning: Session is full ({i} frames), dropping further frames")
+            self.dropped += 1
+            return False
+        band_mags = s_dbfs[self.band]
+        self.times[i] = time_since_start
+        self.magnitudes[i] = band_mags
+        self.ranges[i] = np.nan if peak_range is None else peak_range
+        self.count += 1
+        if self.writer is not None:
+            self.writer.writerows([time_since_start, f, mag, peak_range] for f, mag in zip(self.band_freq, band_mags))
+        end = self.first_frame + self.images * self.stride + self.img_size
+        if self.count == end and (self.window_stride is not None or self.images < self.num_img):
+            self.write_image(end - self.img_size)
+        return True
+
+    def write_image(self, start):
+        import cv2 # type: ignore
+        calc_dist = window_modes(self.ranges[start:start + self.img_size], self.img_size, self.img_size)[0]
+        image_file_name = (f"{self.image_path}/{self.st}_truedist{self.true_dist:.3f}_calcdist{calc_dist:.3f}"
+                           f"_bin{self.measure_distance}m_img{self.images+1}.png")
+        cv2.imwrite(image_file_name, magnitudes_to_image(self.magnitudes[start:start + self.img_size], self.img_size))
+        self.images += 1
+        print(f"Exported image {self.images} to {image_file_name}")
+
+    def close(self):
+        """ Finishes the CSV (or writes the compact file)
+        Returns:
+            str: Path of the session data file
+        """
+        n = self.count
+        if self.csv_file is not None:
+            self.csv_file.close()
+            filename = f"{self.file_path}/{self.st}_{self.fft_size}x{n}.csv"
+            os.replace(self.partial_path, filename)
+        else:
+            filename = f"{self.file_path}/{self.st}_{self.fft_size}x{n}.npz"
+            save_compact(filename, self.times[:n], self.band_freq, self.magnitudes[:n], self.ranges[:n])
+        print(f"Exported data to {filename}")
+        if self.dropped:
+            print(f"Dropped {self.dropped} frames beyond max_frames ({len(self.times)})")
+        if self.window_stride is None and self.images < self.num_img:
+            print(f"Not enough data for image {self.images+1}, stopping at image {self.images}")
+        return filename
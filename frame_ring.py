@@ -0,0 +1,198 @@
+'''
+   frame_ring.py
+   Fixed-size shared-memory ring of processed frames (timestamp, dBFS spectrum, peak range)
+   so other local processes (display, writers, analysis) can follow the acquisition loop
+   without pickling or pipes. The acquisition loop is the only writer and never waits for
+   readers: each slot carries the sequence number of the frame in it, and a reader that
+   falls more than one ring behind skips ahead and counts the lost frames as overruns.
+
+   Writer (acquisition loop):
+       ring = FrameRing("fmcw_frames", fft_size)
+       ring.publish(time_since_start, s_dbfs, peak_range)
+       ring.close()
+
+   Reader (any other process):
+       reader = FrameRingReader("fmcw_frames")
+       frame = reader.read()   # (seq, timestamp, spectrum, peak_range) or None
+
+   Monitor a running ring: python3 frame_ring.py fmcw_frames
+'''
+
+import argparse
+import sys
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+HEADER_FIELDS = 4   # magic, capacity, fft_size, write_seq
+MAGIC = 0x464D4357  # "FMCW"
+
+def _layout(buf, capacity, fft_size):
+    """ numpy views over the header and slot arrays of a shared memory buffer """
+    offset = 0
+    def take(dtype, shape):
+        nonlocal offset
+        array = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        offset += array.nbytes
+        return array
+    header = take(np.int64, (HEADER_FIELDS,))
+    seqs = take(np.int64, (capacity,))
+    timestamps = take(np.float64, (capacity,))
+    peak_ranges = take(np.float64, (capacity,))
+    spectra = take(np.float64, (capacity, fft_size))
+    return header, seqs, timestamps, peak_ranges, spectra
+
+def ring_size(capacity, fft_size):
+    """ Bytes needed for a ring of capacity frames of fft_size bins """
+    return 8 * (HEADER_FIELDS + 3 * capacity + capacity * fft_size)
+
+class FrameRing:
+    """ Single-writer shared-memory frame ring
+    A block already using name is taken to be left over from a run that didn't close its
+    ring (e.g. a crash); it is unlinked and created again. Readers still attached to the
+    old block keep seeing its last frames and have to reattach.
+    Args:
+        name (str): Shared memory block name readers attach to
+        fft_size (int): Bins per spectrum
+        capacity (int): Number of frames kept
+    """
+    def __init__(self, name, fft_size, capacity=256):
+        size = ring_size(capacity, fft_size)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            print(f"Warning: Replaced stale shared memory block {name}")
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        self.capacity = capacity
+        self.fft_size = fft_size
+        self.header, self.seqs, self.timestamps, self.peak_ranges, self.spectra = _layout(self.shm.buf, capacity, fft_size)
+        self.seqs[:] = -1
+        self.header[:] = [MAGIC, capacity, fft_size, 0]
+
+    def publish(self, timestamp, spectrum, peak_range=None):
+        """ Writes one frame into the next slot, overwriting the oldest
+        Returns:
+            int: Sequence number of the frame
+        """
+        seq = int(self.header[3])
+        slot = seq % self.capacity
+        self.seqs[slot] = -1   # readers treat the slot as being rewritten
+        self.timestamps[slot] = timestamp
+        self.peak_ranges[slot] = np.nan if peak_range is None else peak_range
+        self.spectra[slot] = spectrum
+        self.seqs[slot] = seq
+        self.header[3] = seq + 1
+        return seq
+
+    def close(self):
+        """ Releases and removes the shared memory block """
+        del self.header, self.seqs, self.timestamps, self.peak_ranges, self.spectra
+        self.shm.close()
+        self.shm.unlink()
+
+class FrameRingReader:
+    """ Follows a FrameRing from another process
+    Args:
+        name (str): Name the writer created the ring with
+        from_start (bool): Start at the oldest frame still in the ring instead of the next new one
+    """
+    def __init__(self, name, from_start=False):
+        # Attaching normally registers the block with this process's resource tracker, which
+        # would remove it when we exit; the writer owns it
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        if header[0] != MAGIC:
+            raise ValueError(f"Shared memory block {name} is not a frame ring")
+        self.capacity, self.fft_size = int(header[1]), int(header[2])
+        self.header, self.seqs, self.timestamps, self.peak_ranges, self.spectra = _layout(self.shm.buf, self.capacity, self.fft_size)
+        write_seq = int(self.header[3])
+        self.next_seq = max(0, write_seq - self.capacity) if from_start else write_seq
+        self.overruns = 0
+
+    @property
+    def lag(self):
+        """ Frames published but not yet read """
+        return int(self.header[3]) - self.next_seq
+
+    def valid(self, seq):
+        """ True while the slot of frame seq has not been overwritten (for views returned by read) """
+        return self.seqs[seq % self.capacity] == seq
+
+    def read(self, copy=False):
+        """ Returns the next unread frame, skipping ahead (and counting overruns) if the writer lapped us
+        Args:
+            copy (bool): Return a copy of the spectrum instead of a view into shared memory. A view
+                stays correct only while valid(seq) is True.
+        Returns:
+            tuple: (seq, timestamp, spectrum, peak_range) with peak_range None when there was no
+                peak, or None if no new frame is available
+        """
+        while True:
+            write_seq = int(self.header[3])
+            if self.next_seq >= write_seq:
+                return None
+            if write_seq - self.next_seq > self.capacity:
+                self.overruns += write_seq - self.capacity - self.next_seq
+                self.next_seq = write_seq - self.capacity
+            seq = self.next_seq
+            slot = seq % self.capacity
+            timestamp = float(self.timestamps[slot])
+            peak_range = float(self.peak_ranges[slot])
+            spectrum = self.spectra[slot].copy() if copy else self.spectra[slot]
+            if self.seqs[slot] != seq:
+                # Overwritten while we were reading it
+                self.overruns += 1
+                self.next_seq += 1
+                continue
+            self.next_seq += 1
+            return seq, timestamp, spectrum, (None if np.isnan(peak_range) else peak_range)
+
+    def read_latest(self, copy=False):
+        """ Skips to the newest frame (for displays that only need the current one) """
+        write_seq = int(self.header[3])
+        if write_seq > self.next_seq + 1:
+            self.next_seq = write_seq - 1
+        return self.read(copy)
+
+    def close(self):
+        del self.header, self.seqs, self.timestamps, self.peak_ranges, self.spectra
+        self.shm.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitor a running frame ring.')
+    parser.add_argument('name', help='Shared memory name of the ring')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between reports (default: 1.0)')
+    args = parser.parse_args()
+
+    reader = FrameRingReader(args.name)
+    print(f"Attached to {args.name}: {reader.capacity} frames x {reader.fft_size} bins")
+    frames, last_report, last_range = 0, time.monotonic(), None
+    try:
+        while True:
+            frame = reader.read()
+            if frame is None:
+                time.sleep(0.001)
+            else:
+                frames += 1
+                last_range = frame[3]
+            now = time.monotonic()
+            if now - last_report >= args.interval:
+                range_text = "N/A" if last_range is None else f"{last_range:.2f} m"
+                print(f"{frames / (now - last_report):.1f} fps, lag {reader.lag}, overruns {reader.overruns}, range {range_text}")
+                frames, last_report = 0, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+'''
+   hw_config.py
+   Desired-state configuration layer for the Phaser, Pluto and TDD device objects. Every
+   attribute write and channel call over IIO is a network round trip, so a CachedConfig
+   remembers the last value it applied for each attribute and only writes the ones that
+   differ. Changed writes are grouped into one batch per apply(): devices that latch
+   their registers on a final write (the ADF4159 "enable") get that write once per batch,
+   and devices that must be disabled while being reprogrammed (the TDD engine) are
+   disabled and re-enabled once around the batch, and not at all when nothing changed.
+
+   RecordingDevice is a stand-in device that logs every write and call, for exercising
+   the configuration code without hardware.
+
+   Example:
+       pll = CachedConfig(my_phaser, latch=("enable", 0))
+       pll.apply({"freq_dev_range": int(bw / 4)})   # writes freq_dev_range, then enable
+       pll.apply({"freq_dev_range": int(bw / 4)})   # no writes
+'''
+
+_MISSING = object()
+
+def resolve(device, path):
+    """ Object and attribute name for a dotted path such as "channel.0.enable" or "_gpios.gpio_tx_sw" """
+    parts = path.split(".")
+    obj = device
+    for part in parts[:-1]:
+        obj = obj[int(part)] if part.isdigit() else getattr(obj, part)
+    return obj, parts[-1]
+
+class CachedConfig:
+    """ Writes only the attributes whose desired value differs from the last applied one
+    Args:
+        device: pyadi-iio device object (or a RecordingDevice)
+        latch (tuple): (attribute, value) written after every batch with changes
+        guard (str): Boolean attribute set False before a batch with changes and True after
+    """
+    def __init__(self, device, latch=None, guard=None):
+        self.device = device
+        self.latch = latch
+        self.guard = guard
+        self.applied = {}
+        self.writes = 0
+        self.skipped = 0
+
+    def _write(self, path, value):
+        obj, name = resolve(self.device, path)
+        setattr(obj, name, value)
+        self.writes += 1
+
+    def apply(self, settings):
+        """ Brings the device to the desired settings, writing changed values in order
+        Args:
+            settings (dict): Dotted attribute path -> value, in write order
+        Returns:
+            list: Paths that were written
+        """
+        changes = [(path, value) for path, value in settings.items() if self.applied.get(path, _MISSING) != value]
+        self.skipped += len(settings) - len(changes)
+        if not changes:
+            return []
+        if self.guard:
+            self._write(self.guard, False)
+        for path, value in changes:
+            self._write(path, value)
+            self.applied[path] = value
+        if self.latch:
+            self._write(*self.latch)
+        if self.guard:
+            self._write(self.guard, True)
+        return [path for path, _ in changes]
+
+    def call(self, method, *args, value, **kwargs):
+        """ Calls device.method(*args, value, **kwargs) unless value matches the last call with these args
+        Returns:
+            bool: True if the call was made
+        """
+        key = (method,) + args
+        if self.applied.get(key, _MISSING) == value:
+            self.skipped += 1
+            return False
+        getattr(self.device, method)(*args, value, **kwargs)
+        self.applied[key] = value
+        self.writes += 1
+        return True
+
+    def once(self, method, *args, **kwargs):
+        """ Calls device.method(*args, **kwargs) the first time only (e.g. loading calibration tables)
+        Returns:
+            bool: True if the call was made
+        """
+        key = ("once", method) + args + tuple(sorted(kwargs.items()))
+        if key in self.applied:
+            self.skipped += 1
+            return False
+        getattr(self.device, method)(*args, **kwargs)
+        self.applied[key] = True
+        self.writes += 1
+        return True
+
+    def invalidate(self, paths=None):
+        """ Forgets applied values (all, or the given paths) after the device was changed behind our back """
+        if paths is None:
+            self.applied.clear()
+        else:
+            for path in paths:
+                self.applied.pop(path, None)
+
+# Values read back from the TDD channels by chirp_timing() and shutdown()
+TDD_CHANNEL_DEFAULTS = {"on_ms": 0, "off_ms": 0, "on_raw": 0, "off_raw": 10, "polarity": False, "enable": True}
+
+class RecordingDevice:
+    """ Stub IIO device that records writes and method calls
+    Attribute writes are logged as ("set", "<name>.<attr>", value) and calls to any method
+    that isn't defined as ("call", "<name>.<method>", args, kwargs). Child devices (channels,
+    _gpios) share the parent's log.
+    Reading an attribute that was never set returns a recording method, so any value the
+    code under test reads must be seeded: pass it in attrs, or in channel_attrs for the
+    channels. For example chirp_timing() reads tdd.channel[0].on_ms, so a TDD stub
+    needs channel_attrs={"on_ms": 0} (TDD_CHANNEL_DEFAULTS).
+    Args:
+        name (str): Prefix used in the log
+        num_channels (int): Number of child devices in .channel
+        children (list): Attribute names of extra child devices, e.g. ["_gpios"]
+        channel_attrs (dict): Initial attribute values of every channel (not logged)
+        **attrs: Initial attribute values (not logged)
+    """
+    def __init__(self, name="dev", num_channels=0, children=None, log=None, channel_attrs=None, **attrs):
+        object.__setattr__(self, "log", [] if log is None else log)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "channel", [RecordingDevice(f"{name}.channel[{i}]", log=self.log, **(channel_attrs or {}))
+                                             for i in range(num_channels)])
+        for attr in (children or []):
+            object.__setattr__(self, attr, RecordingDevice(f"{name}.{attr}", log=self.log))
+        for attr, value in attrs.items():
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, attr, value):
+        self.log.append(("set", f"{self.name}.{attr}", value))
+        object.__setattr__(self, attr, value)
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        def method(*args, **kwargs):
+            self.log.append(("call", f"{self.name}.{attr}", args, kwargs))
+        return method
@@ -0,0 +1,71 @@
+'''
+   imaging.py
+   Turns frames x bins dBFS magnitude windows into the Viridis images stored in
+   DataSet/<bin>/Images. Shared by the live export in FMCW_Bulk_Data_Export.py and
+   the offline tools so every image goes through the same scaling, flips and colormap.
+'''
+
+import numpy as np
+
+magnitude_min = -100
+magnitude_max = 0
+
+def downsample(data, target_size, mode='auto', axis=-1):
+    """ Resample data to target_size points along axis
+    Args:
+        data (np.array): Input array, any number of dimensions
+        target_size (int): Number of points to produce along axis
+        mode (str): 'mean' averages blocks of len // target_size points and drops the
+            remainder (the original per-frame downsample()), 'linear' interpolates,
+            'nearest' repeats the closest point, 'auto' uses 'mean' unless target_size
+            is larger than the input
+        axis (int): Axis to resample
+    Returns:
+        np.array: data with axis resized to target_size
+    """
+    data = np.moveaxis(np.asarray(data, dtype=float), axis, -1)
+    length = data.shape[-1]
+    if mode == 'auto':
+        mode = 'mean' if target_size <= length else 'linear'
+
+    if mode == 'mean':
+        factor = length // target_size
+        if factor == 0:
+            raise ValueError(f"Cannot mean-downsample {length} points to {target_size}")
+        blocks = data[..., :factor * target_size].reshape(data.shape[:-1] + (target_size, factor))
+        out = blocks.mean(axis=-1)
+    elif mode in ('linear', 'nearest'):
+        positions = np.linspace(0, length - 1, target_size)
+        if mode == 'nearest':
+            out = data[..., np.rint(positions).astype(int)]
+        else:
+            lower = np.floor(positions).astype(int)
+            upper = np.minimum(lower + 1, length - 1)
+            weight = positions - lower
+            out = data[..., lower] * (1 - weight) + data[..., upper] * weight
+    else:
+        raise ValueError(f"Unknown downsample mode '{mode}'")
+    return np.moveaxis(out, -1, axis)
+
+def magnitudes_to_image(magnitudes, img_size, mode='auto'):
+    """ Builds one dataset image from a window of spectra
+    Args:
+        magnitudes (np.array): dBFS magnitudes shaped (frames, bins)
+        img_size (int): Output image width and height in pixels
+        mode (str): Resampling mode passed to downsample()
+    Returns:
+        np.array: BGR uint8 image shaped (img_size, img_size, 3)
+    """
+    import cv2 # type: ignore
+    shifted = (np.asarray(magnitudes, dtype=float) - magnitude_min) / (magnitude_max - magnitude_min) * (img_size+1)
+    image = downsample(shifted, img_size, mode, axis=1)
+    if image.shape[0] != img_size:
+        image = downsample(image, img_size, mode, axis=0)
+
+    # Higher frequencies at the top, newest frame on the left
+    image = np.flipud(image.T)
+    image = np.fliplr(image)
+
+    normalized_data = cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX)
+    image_data_out = normalized_data.astype(np.uint8)
+    return cv2.applyColorMap(image_data_out, cv2.COLORMAP_VIRIDIS)
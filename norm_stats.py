@@ -0,0 +1,201 @@
+'''
+   norm_stats.py
+   Per-frequency-bin normalization statistics (count, mean, std, min, max) for the
+   DataSet, kept in a small JSON store so training and image export can query them
+   without reading the raw files. Stats are built with the parallel form of Welford's
+   algorithm: each file is reduced to (count, mean, M2, min, max) in a worker and the
+   partial results are merged, so adding new sessions only costs a pass over the new
+   files. The store holds a "global" scope, one "bin/<bin dir>" scope per class and one
+   "session/<mmdd-HHMMSS>" scope per capture session.
+
+   Usage: python3 norm_stats.py --dir DataSet --store norm_stats.json
+          python3 norm_stats.py --show bin/0.37-0.52
+'''
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dataset_io import iter_filtered_csvs, load_filtered_csv, parse_sample_name
+
+STORE_VERSION = 1
+
+class RunningStats:
+    """ Mergeable per-bin count/mean/M2/min/max
+    Args:
+        num_bins (int): Number of frequency bins tracked
+    """
+    def __init__(self, num_bins):
+        self.count = 0
+        self.mean = np.zeros(num_bins)
+        self.m2 = np.zeros(num_bins)
+        self.min = np.full(num_bins, np.inf)
+        self.max = np.full(num_bins, -np.inf)
+
+    @classmethod
+    def from_frames(cls, frames):
+        """ Stats of a (frames, bins) magnitude array in one vectorized pass """
+        frames = np.asarray(frames, dtype=np.float64)
+        stats = cls(frames.shape[1])
+        stats.count = frames.shape[0]
+        if stats.count:
+            stats.mean = frames.mean(axis=0)
+            stats.m2 = ((frames - stats.mean) ** 2).sum(axis=0)
+            stats.min = frames.min(axis=0)
+            stats.max = frames.max(axis=0)
+        return stats
+
+    def update(self, frames):
+        """ Adds a (frames, bins) array """
+        self.merge(RunningStats.from_frames(frames))
+
+    def merge(self, other):
+        """ Combines other into self (Chan et al. pairwise update) """
+        if other.count == 0:
+            return self
+        if len(other.mean) != len(self.mean):
+            raise ValueError(f"Cannot merge stats over {len(other.mean)} bins into {len(self.mean)} bins")
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / total)
+        self.count = total
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count else np.full(len(self.mean), np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def normalize(self, magnitudes, eps=1e-6):
+        """ Standardizes magnitudes (..., bins) with these per-bin mean and std """
+        return (magnitudes - self.mean) / (self.std + eps)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean.tolist(), "m2": self.m2.tolist(),
+                "min": self.min.tolist(), "max": self.max.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(len(data["mean"]))
+        stats.count = data["count"]
+        for field in ("mean", "m2", "min", "max"):
+            setattr(stats, field, np.array(data[field], dtype=np.float64))
+        return stats
+
+def file_fingerprint(path):
+    """ Cheap change detector for a data file: size and modification time """
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+class StatsStore:
+    """ Scoped RunningStats plus the fingerprints of the files already folded in
+    Args:
+        path (str): JSON file the store is read from and saved to
+    """
+    def __init__(self, path="norm_stats.json"):
+        self.path = path
+        self.scopes = {}
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") != STORE_VERSION:
+                print(f"Warning: Ignoring {path} written by another store version")
+            else:
+                self.scopes = {name: RunningStats.from_dict(s) for name, s in data["scopes"].items()}
+                self.files = data["files"]
+
+    def get(self, scope="global"):
+        """ RunningStats for a scope ("global", "bin/<bin dir>" or "session/<mmdd-HHMMSS>") """
+        if scope not in self.scopes:
+            raise KeyError(f"No stats for scope '{scope}'")
+        return self.scopes[scope]
+
+    def add(self, stats, bin_dir=None, session=None):
+        """ Folds one file's stats into the global, bin and session scopes """
+        scopes = ["global"]
+        if bin_dir:
+            scopes.append(f"bin/{bin_dir}")
+        if session:
+            scopes.append(f"session/{session}")
+        for scope in scopes:
+            if scope in self.scopes:
+                self.scopes[scope].merge(stats)
+            else:
+                self.scopes[scope] = RunningStats(len(stats.mean)).merge(stats)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": STORE_VERSION, "files": self.files,
+                       "scopes": {name: s.to_dict() for name, s in sorted(self.scopes.items())}}, f)
+        os.replace(tmp_path, self.path)
+
+def file_stats(csv_path):
+    """ Worker: RunningStats of one FilteredCSV file (None if it can't be read) """
+    try:
+        _, _, magnitudes, _ = load_filtered_csv(csv_path)
+    except Exception as e:
+        print(f"Error processing {csv_path}: {e}")
+        return None
+    return RunningStats.from_frames(magnitudes)
+
+def update_store(base_dir="DataSet", store_path="norm_stats.json", workers=None, rebuild=False):
+    """ Folds every FilteredCSV file not yet in the store into it
+    Files whose size or mtime changed since they were added can't be taken back out of
+    the merged stats; they are reported and the store should be rebuilt.
+    Returns:
+        StatsStore: The updated (and saved) store
+    """
+    if rebuild and os.path.exists(store_path):
+        os.remove(store_path)
+    store = StatsStore(store_path)
+    new_files, changed = [], []
+    for bin_dir, csv_path in iter_filtered_csvs(base_dir):
+        key = os.path.relpath(csv_path, base_dir)
+        if key not in store.files:
+            new_files.append((bin_dir, csv_path, key))
+        elif store.files[key] != file_fingerprint(csv_path):
+            changed.append(key)
+    if changed:
+        print(f"Warning: {len(changed)} files changed since they were added (e.g. {changed[0]}); "
+              f"run with --rebuild to recompute")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(file_stats, [csv_path for _, csv_path, _ in new_files], chunksize=16)
+        for (bin_dir, csv_path, key), stats in zip(new_files, results):
+            if stats is None:
+                continue
+            info = parse_sample_name(csv_path)
+            store.add(stats, bin_dir, info["session"] if info else None)
+            store.files[key] = file_fingerprint(csv_path)
+    store.save()
+    print(f"Added {len(new_files)} files to {store_path} ({len(store.files)} total)")
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain per-bin normalization statistics for the dataset.')
+    parser.add_argument('--dir', default='DataSet', help='Dataset directory (default: DataSet)')
+    parser.add_argument('--store', default='norm_stats.json', help='Stats store (default: norm_stats.json)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute the store from scratch')
+    parser.add_argument('--show', metavar='SCOPE', help='Print a scope from the store instead of updating it')
+    args = parser.parse_args()
+
+    if args.show:
+        stats = StatsStore(args.store).get(args.show)
+        print(f"{args.show}: {stats.count} frames x {len(stats.mean)} bins")
+        print(f"mean {stats.mean.mean():.2f} dBFS, std {stats.std.mean():.2f} dB (averaged over bins)")
+        print(f"min {stats.min.min():.2f} dBFS, max {stats.max.max():.2f} dBFS")
+        return
+    update_store(args.dir, args.store, args.workers, args.rebuild)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+'''
+   parameter_sweep.py
+   Offline grid search over the peak detection settings of FMCW_Bulk_Data_Export.py
+   (range_threshold, freq_offset, the minbin/maxbin gate and the CFAR bias/guard/ref
+   values). The stored FilteredCSV magnitudes are loaded once, every parameter point
+   re-runs CFAR and the strongest peak search on all frames at once, and per-bin
+   accuracy is reported for each point.
+
+   Results are cached in a JSON file keyed by parameter point, so refining a grid
+   only evaluates the points that have not been seen before.
+
+   Note: the FilteredCSV files only hold the band around the ranges of interest (60
+   bins), much less than the live 256-bin spectrum. cfar() only computes a threshold
+   where the full guard + reference window fits, and gives every other cell the
+   smallest computed threshold, so the live guard/ref values (15/16, a 63-cell window)
+   leave no cell with a threshold at all. Points whose window doesn't fit the band
+   (2 * (cfar_guard + cfar_ref) + 1 > bins) are skipped with a warning, and the defaults
+   are scaled down to fit.
+'''
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dataset_io import load_dataset
+from fmcw_processing import range_to_freq
+from data_analysis import parse_bin_range
+from target_detection_dbfs import cfar_batch, find_peaks_batch
+
+# Radar settings used when the dataset was captured (see FMCW_Bulk_Data_Export.py)
+c = 3e8
+signal_freq = 100000
+default_chirp_bw = 1000e6
+ramp_time_s = 450 / 1e6
+slope = default_chirp_bw / ramp_time_s
+
+PARAM_NAMES = ("range_threshold", "freq_offset", "binmin", "binmax",
+               "use_cfar", "cfar_bias", "cfar_guard", "cfar_ref")
+
+_dataset = None
+
+def peak_ranges(magnitudes, freq, params):
+    """Re-run the live peak extraction on a stack of frames.
+
+    Args:
+        magnitudes (np.array): dBFS spectra shaped (frames, bins)
+        freq (np.array): Frequency of each bin
+        params (dict): One parameter point, keys as in PARAM_NAMES
+    Returns:
+        np.array: Peak range per frame, NaN where no peak passed range_threshold
+    """
+    if params["use_cfar"]:
+        _, targets = cfar_batch(magnitudes, int(params["cfar_guard"]), int(params["cfar_ref"]),
+                                params["cfar_bias"], 'average')
+        magnitudes = targets.filled(-200)
+
+    offset_freq = signal_freq + params["freq_offset"]
+    minbin_freq = range_to_freq(params["binmin"], slope, offset_freq, c)
+    maxbin_freq = range_to_freq(params["binmax"], slope, offset_freq, c)
+    _, _, ranges, _ = find_peaks_batch(freq, magnitudes, minbin_freq, maxbin_freq,
+                                       threshold=params["range_threshold"],
+                                       ref_freq=offset_freq, slope=slope, c=c)
+    return ranges[:, 0]
+
+def bin_accuracy(ranges, bin_dir):
+    """Fraction of frames whose peak range falls in the bin named bin_dir.
+    Bins without a parsable range (no_object captures) count frames with no peak.
+    """
+    bin_low, bin_high = parse_bin_range(bin_dir)
+    if bin_low is None:
+        return float(np.mean(np.isnan(ranges)))
+    found = ranges[~np.isnan(ranges)]
+    if found.size == 0:
+        return 0.0
+    return float(np.mean((found >= bin_low) & (found <= bin_high)))
+
+def cfar_fits(params, num_bins):
+    """True if CFAR is off or at least one cell has its full guard + reference window"""
+    if not params["use_cfar"]:
+        return True
+    return 2 * (int(params["cfar_guard"]) + int(params["cfar_ref"])) < num_bins
+
+def evaluate_point(params):
+    """Evaluate one parameter point against the dataset loaded by _init_worker."""
+    magnitudes = _dataset["magnitudes"]
+    num_files, num_frames, num_bins = magnitudes.shape
+    ranges = peak_ranges(magnitudes.reshape(-1, num_bins), _dataset["freq"], params)
+    ranges = ranges.reshape(num_files, num_frames)
+
+    accuracy = {}
+    for bin_dir, file_idx in _dataset["bin_index"].items():
+        accuracy[bin_dir] = bin_accuracy(ranges[file_idx].ravel(), bin_dir)
+    return {"params": params, "accuracy": accuracy,
+            "mean_accuracy": float(np.mean(list(accuracy.values())))}
+
+def _init_worker(dataset):
+    global _dataset
+    _dataset = dataset
+
+def param_key(params):
+    return json.dumps([params[name] for name in PARAM_NAMES])
+
+def dataset_signature(dataset):
+    """Short hash identifying the files a cache was computed against."""
+    digest = hashlib.sha1()
+    for path in dataset["paths"]:
+        digest.update(path.encode())
+        digest.update(str(os.path.getsize(path)).encode())
+    return digest.hexdigest()
+
+def load_cache(cache_path, signature):
+    if not os.path.isfile(cache_path):
+        return {}
+    with open(cache_path) as f:
+        cache = json.load(f)
+    if cache.get("signature") != signature:
+        print(f"Dataset changed since {cache_path} was written, ignoring cached results")
+        return {}
+    return cache.get("results", {})
+
+def save_cache(cache_path, signature, results):
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"signature": signature, "results": results}, f)
+    os.replace(tmp_path, cache_path)
+
+def build_grid(args):
+    """Cartesian product of the swept values as a list of parameter dicts."""
+    grid = []
+    for values in itertools.product(*(getattr(args, name) for name in PARAM_NAMES)):
+        params = dict(zip(PARAM_NAMES, values))
+        if not params["use_cfar"]:
+            # CFAR settings don't matter with CFAR off, so collapse them to one point
+            params.update(cfar_bias=0, cfar_guard=0, cfar_ref=0)
+        if params not in grid:
+            grid.append(params)
+    return grid
+
+def run_sweep(grid, base_dir="DataSet", cache_path="sweep_cache.json", workers=None):
+    """Evaluate every point in grid, reusing cached results where possible.
+
+    Returns:
+        list: One result dict per grid point, in grid order; points whose CFAR window
+            doesn't fit the stored band are left out
+    """
+    dataset = load_dataset(base_dir)
+    if dataset is None:
+        print("No data found.")
+        return []
+    bin_index = {}
+    for i, bin_dir in enumerate(dataset["bin_dirs"]):
+        bin_index.setdefault(bin_dir, []).append(i)
+    dataset["bin_index"] = bin_index
+    print(f"Loaded {dataset['magnitudes'].shape[0]} files "
+          f"({dataset['magnitudes'].shape[1]} frames x {dataset['magnitudes'].shape[2]} bins each)")
+
+    num_bins = dataset["magnitudes"].shape[2]
+    skipped = [p for p in grid if not cfar_fits(p, num_bins)]
+    for p in skipped:
+        print(f"Skipping cfar_guard={p['cfar_guard']}, cfar_ref={p['cfar_ref']}: a "
+              f"{2 * (p['cfar_guard'] + p['cfar_ref']) + 1}-cell CFAR window doesn't fit {num_bins} bins")
+    grid = [p for p in grid if cfar_fits(p, num_bins)]
+
+    signature = dataset_signature(dataset)
+    cached = load_cache(cache_path, signature) if cache_path else {}
+    todo = [p for p in grid if param_key(p) not in cached]
+    print(f"{len(grid)} parameter points, {len(grid) - len(todo)} cached, {len(todo)} to evaluate")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(dataset,)) as executor:
+            for result in executor.map(evaluate_point, todo):
+                cached[param_key(result["params"])] = result
+        if cache_path:
+            save_cache(cache_path, signature, cached)
+
+    return [cached[param_key(p)] for p in grid]
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep peak detection settings over the stored DataSet.')
+    parser.add_argument('--dir', default='DataSet', help='Base directory to scan (default: DataSet)')
+    parser.add_argument('--cache', default='sweep_cache.json', help='Result cache file (default: sweep_cache.json)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--out', help='Optional CSV file for the full results table')
+    parser.add_argument('--range-threshold', dest='range_threshold', type=float, nargs='+', default=[-20])
+    parser.add_argument('--freq-offset', dest='freq_offset', type=float, nargs='+', default=[25e3])
+    parser.add_argument('--binmin', type=float, nargs='+', default=[0.0], help='Lower edge of the peak search gate (m)')
+    parser.add_argument('--binmax', type=float, nargs='+', default=[89 * 2.54 / 100], help='Upper edge of the peak search gate (m)')
+    parser.add_argument('--cfar', dest='use_cfar', type=int, nargs='+', default=[0], choices=[0, 1])
+    parser.add_argument('--cfar-bias', dest='cfar_bias', type=float, nargs='+', default=[25])
+    parser.add_argument('--cfar-guard', dest='cfar_guard', type=int, nargs='+', default=[4],
+                        help='Guard cells per side; 2 * (guard + ref) must stay below the band width')
+    parser.add_argument('--cfar-ref', dest='cfar_ref', type=int, nargs='+', default=[8])
+    args = parser.parse_args()
+
+    results = run_sweep(build_grid(args), args.dir, args.cache, args.workers)
+    if not results:
+        return
+
+    results = sorted(results, key=lambda r: r["mean_accuracy"], reverse=True)
+    bin_names = sorted(results[0]["accuracy"].keys())
+    print("\n===== Sweep Results (best first) =====")
+    for result in results:
+        point = ", ".join(f"{name}={result['params'][name]}" for name in PARAM_NAMES)
+        per_bin = " ".join(f"{name}:{result['accuracy'][name]:.2%}" for name in bin_names)
+        print(f"{result['mean_accuracy']:.2%} | {point} | {per_bin}")
+
+    if args.out:
+        with open(args.out, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(list(PARAM_NAMES) + ["mean_accuracy"] + bin_names)
+            for result in results:
+                writer.writerow([result["params"][name] for name in PARAM_NAMES]
+                                + [result["mean_accuracy"]]
+                                + [result["accuracy"][name] for name in bin_names])
+        print(f"Exported results to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+'''
+   radar_hardware.py
+   Setup and teardown of the CN0566 Phaser, the Pluto (ad9361) and the Pluto TDD engine,
+   split out of FMCW_Bulk_Data_Export.py into explicit steps. Nothing here talks to
+   the hardware at import time, and pyadi-iio is only imported when connecting.
+'''
+
+import json
+import os
+import numpy as np
+from hw_config import CachedConfig
+
+gain_list = [8, 34, 84, 127, 127, 84, 34, 8]  # Blackman taper
+
+def connect(sdr_ip="ip:192.168.2.1", rpi_ip="ip:phaser.local"):
+    """ Instantiates the Pluto and the Phaser
+    Returns:
+        tuple: (my_sdr, my_phaser)
+    """
+    import adi # type: ignore
+    my_sdr = adi.ad9361(uri=sdr_ip)
+    my_phaser = adi.CN0566(uri=rpi_ip, sdr=my_sdr)
+    return my_sdr, my_phaser
+
+def configure_phaser(my_phaser, gains=gain_list, config=None):
+    """ Initializes both ADAR1000s with calibrated gains and all phases at 0, and sets the Pi GPIOs
+    Args:
+        config (CachedConfig): Cache over my_phaser; only values that changed since its last apply are written
+    Returns:
+        CachedConfig: The phaser channel/GPIO configuration
+    """
+    config = config or CachedConfig(my_phaser)
+    config.once("configure", device_mode="rx")
+    config.once("load_gain_cal")
+    config.once("load_phase_cal")
+    for i in range(0, 8):
+        config.call("set_chan_phase", i, value=0)
+
+    for i in range(0, len(gains)):
+        config.call("set_chan_gain", i, value=gains[i], apply_cal=True)
+
+    # Setup Raspberry Pi GPIO states
+    config.apply({
+        "_gpios.gpio_tx_sw": 0,  # 0 = TX_OUT_2, 1 = TX_OUT_1
+        "_gpios.gpio_vctrl_1": 1, # 1=Use onboard PLL/LO source  (0=disable PLL and VCO, and set switch to use external LO input)
+        "_gpios.gpio_vctrl_2": 1, # 1=Send LO to transmit circuitry  (0=disable Tx path, and send LO to LO_OUT)
+    })
+    return config
+
+def set_beam_phase_diff(config, phase_delta):
+    """ Steers the receive beam like CN0566.set_beam_phase_diff(), writing only channels whose phase changed
+    Args:
+        config (CachedConfig): Phaser configuration from configure_phaser()
+        phase_delta (float): Phase difference between adjacent elements in degrees
+    """
+    for ch in range(0, 8):
+        config.call("set_chan_phase", ch, value=phase_delta * ch)
+
+def configure_sdr(my_sdr, sample_rate, center_freq, rx_gain, config=None):
+    """ Configures Pluto Rx and Tx
+    Returns:
+        tuple: (sample rate the Pluto actually accepted, CachedConfig over my_sdr)
+    """
+    config = config or CachedConfig(my_sdr)
+    # Configure SDR Rx
+    config.apply({"sample_rate": int(sample_rate)})
+    sample_rate = int(my_sdr.sample_rate)
+    config.apply({
+        "rx_lo": int(center_freq),  # set this to output_freq - (the freq of the HB100)
+        "rx_enabled_channels": [0, 1],  # enable Rx1 and Rx2
+        "gain_control_mode_chan0": "manual",  # manual or slow_attack
+        "gain_control_mode_chan1": "manual",  # manual or slow_attack
+        "rx_hardwaregain_chan0": int(rx_gain),  # must be between -3 and 70
+        "rx_hardwaregain_chan1": int(rx_gain),  # must be between -3 and 70
+        # Configure SDR Tx
+        "tx_lo": int(center_freq),
+        "tx_enabled_channels": [0, 1],
+        "tx_cyclic_buffer": True,  # must set cyclic buffer to true for the tdd burst mode.  Otherwise Tx will turn on and off randomly
+        "tx_hardwaregain_chan0": -88,  # must be between 0 and -88
+        "tx_hardwaregain_chan1": -0,  # must be between 0 and -88
+    })
+    return sample_rate, config
+
+def configure_pll(my_phaser, output_freq, signal_freq, center_freq, chirp_bw, ramp_time, config=None):
+    """ Configures the ADF4159 ramping PLL for single sawtooth bursts
+    Args:
+        config (CachedConfig): Cache over my_phaser with latch ("enable", 0), see pll_config()
+    Returns:
+        tuple: (ramp time (us) the PLL actually accepted, PLL CachedConfig). The sample
+            offsets use the accepted ramp time; the TDD chirp spacing (configure_tdd) is
+            derived from the requested one.
+    """
+    config = config or pll_config(my_phaser)
+    vco_freq = int(output_freq + signal_freq + center_freq)
+    num_steps = int(ramp_time)    # in general it works best if there is 1 step per us
+    print("requested freq dev time = ", ramp_time)
+    # enable = 0 (PLL enable) is written last by the config latch to update all the registers
+    config.apply({
+        "frequency": int(vco_freq / 4),
+        "freq_dev_range": int(chirp_bw / 4),      # total freq deviation of the complete freq ramp in Hz
+        "freq_dev_step": int((chirp_bw / 4) / num_steps),  # This is fDEV, in Hz.  Can be positive or negative
+        "freq_dev_time": int(ramp_time),  # total time (in us) of the complete frequency ramp
+        "delay_word": 4095,  # 12 bit delay word.  4095*PFD = 40.95 us.  For sawtooth ramps, this is also the length of the Ramp_complete signal
+        "delay_clk": "PFD",  # can be 'PFD' or 'PFD*CLK1'
+        "delay_start_en": 0,  # delay start
+        "ramp_delay_en": 0,  # delay between ramps.
+        "trig_delay_en": 0,  # triangle delay
+        "ramp_mode": "single_sawtooth_burst",  # ramp_mode can be:  "disabled", "continuous_sawtooth", "continuous_triangular", "single_sawtooth_burst", "single_ramp_burst"
+        "sing_ful_tri": 0,  # full triangle enable/disable -- this is used with the single_ramp_burst mode
+        "tx_trig_en": 1,  # start a ramp with TXdata
+    })
+    ramp_time = int(my_phaser.freq_dev_time)
+    print("actual freq dev time = ", ramp_time)
+    return ramp_time, config
+
+def pll_config(my_phaser):
+    """ CachedConfig for the ADF4159 registers; any batch of changes ends with enable = 0 to latch them """
+    return CachedConfig(my_phaser, latch=("enable", 0))
+
+def configure_tdd(sdr_ip, ramp_time, num_chirps=1, pri_pad_ms=0.01, pins_config=None, tdd_config=None):
+    """ Synchronizes chirps to the start of each Pluto receive buffer
+    Args:
+        sdr_ip (str): Pluto URI
+        ramp_time (int): Chirp ramp time in us
+        num_chirps (int): Chirps in one continuous receive buffer
+        pri_pad_ms (float): Dead time added to the ramp time to get the chirp spacing
+        pins_config, tdd_config (CachedConfig): Existing configs to reprogram instead of opening the devices
+    Returns:
+        tuple: (sdr_pins, tdd, pins_config, tdd_config)
+    """
+    if pins_config is None or tdd_config is None:
+        import adi # type: ignore
+        pins_config = CachedConfig(adi.one_bit_adc_dac(sdr_ip))
+        tdd_config = CachedConfig(adi.tddn(sdr_ip), guard="enable")   # disable TDD to configure the registers
+    pins_config.apply({
+        "gpio_tdd_ext_sync": True, # If set to True, this enables external capture triggering using the L24N GPIO on the Pluto.  When set to false, an internal trigger pulse will be generated every second
+        "gpio_phaser_enable": True,
+    })
+    PRI_ms = ramp_time/1e3 + pri_pad_ms
+    settings = {
+        "sync_external": True,
+        "startup_delay_ms": 0,
+        "frame_length_ms": PRI_ms,    # each chirp is spaced this far apart
+        "burst_count": num_chirps,       # number of chirps in one continuous receive buffer
+    }
+    for channel in range(3):
+        settings[f"channel.{channel}.enable"] = True
+        settings[f"channel.{channel}.polarity"] = False
+        settings[f"channel.{channel}.on_raw"] = 0
+        settings[f"channel.{channel}.off_raw"] = 10
+    tdd_config.apply(settings)
+    return pins_config.device, tdd_config.device, pins_config, tdd_config
+
+def chirp_timing(ramp_time, sample_rate, frame_length_ms, on_ms=0, num_chirps=1, buffer_factor=1.75):
+    """ Derives the sample offsets, FFT size and receive buffer size from the chirp timing
+    Args:
+        ramp_time (int): Chirp ramp time in us
+        sample_rate (int): Pluto sample rate
+        frame_length_ms (float): TDD frame length (chirp spacing)
+        on_ms (float): TDD channel 0 on time
+        num_chirps (int): Chirps per receive buffer
+        buffer_factor (float): Receive buffer length as a multiple of the total chirp time
+    Returns:
+        dict: ramp_time_s, good_ramp_samples, start_offset_samples, num_samples_frame,
+            fft_size, total_time and buffer_time (ms) and buffer_size (samples)
+    """
+    # From start of each ramp, how many "good" points do we want?
+    # For best freq linearity, stay away from the start of the ramps
+    ramp_time_s = ramp_time / 1e6
+    begin_offset_time = 0.10 * ramp_time_s   # time in seconds
+    good_ramp_samples = int((ramp_time_s-begin_offset_time) * sample_rate)
+    start_offset_time = on_ms/1e3 + begin_offset_time
+    start_offset_samples = int(start_offset_time * sample_rate)
+
+    # size the fft for the number of ramp data points
+    power=8
+    fft_size = int(2**power)
+    num_samples_frame = int(frame_length_ms/1000*sample_rate)
+    while num_samples_frame > fft_size:
+        power=power+1
+        fft_size = int(2**power)
+        if power==18:
+            break
+
+    # Pluto receive buffer size needs to be greater than total time for all chirps
+    total_time = frame_length_ms * num_chirps   # time in ms
+    buffer_time = total_time * buffer_factor
+    buffer_size = int(buffer_time*sample_rate/1000)
+    return {
+        "ramp_time_s": ramp_time_s,
+        "good_ramp_samples": good_ramp_samples,
+        "start_offset_samples": start_offset_samples,
+        "num_samples_frame": num_samples_frame,
+        "fft_size": fft_size,
+        "total_time": total_time,
+        "buffer_time": buffer_time,
+        "buffer_size": buffer_size,
+    }
+
+TIMING_DEFAULTS = {"num_chirps": 1, "pri_pad_ms": 0.01, "buffer_factor": 1.75}
+
+def load_timing_config(path):
+    """ Burst count, PRI pad and buffer factor written by timing_tuner.py
+    Returns:
+        dict: num_chirps, pri_pad_ms and buffer_factor; the defaults where path doesn't exist
+    """
+    timing = dict(TIMING_DEFAULTS)
+    if path and os.path.exists(path):
+        with open(path) as f:
+            tuned = json.load(f)
+        timing.update({key: tuned[key] for key in TIMING_DEFAULTS if key in tuned})
+    return timing
+
+def tx_waveform(signal_freq, sample_rate, num_samples=2**18):
+    """ Complex sinewave at signal_freq for Pluto's cyclic Tx buffer """
+    ts = 1 / float(sample_rate)
+    t = np.arange(0, num_samples * ts, ts)
+    i = np.cos(2 * np.pi * t * int(signal_freq)) * 2 ** 14
+    q = np.sin(2 * np.pi * t * int(signal_freq)) * 2 ** 14
+    return 1 * (i + 1j * q)
+
+def start_tx(my_sdr, signal_freq, sample_rate):
+    """ Uploads the Tx waveform and starts transmitting from Pluto """
+    iq = tx_waveform(signal_freq, sample_rate)
+    my_sdr._ctx.set_timeout(30000)
+    my_sdr._rx_init_channels()
+    my_sdr.tx([iq, iq])
+
+def shutdown(my_sdr, tdd, sdr_pins, configs=()):
+    """ Clears the Pluto Tx buffer, then disables TDD and reverts to non-TDD (standard) mode
+    Args:
+        configs (iterable): CachedConfigs to invalidate, since this writes the devices directly
+    """
+    for config in configs:
+        config.invalidate()
+    my_sdr.tx_destroy_buffer()
+    print("Program finished and Pluto Tx Buffer Cleared")
+    tdd.enable = False
+    sdr_pins.gpio_phaser_enable = False
+    tdd.channel[1].polarity = not(sdr_pins.gpio_phaser_enable)
+    tdd.channel[2].polarity = sdr_pins.gpio_phaser_enable
+    tdd.enable = True
+    tdd.enable = False
@@ -0,0 +1,111 @@
+'''
+   range_tracker.py
+   Alpha-beta tracker over successive peak ranges. While a target is tracked the peak
+   search only looks at a narrow gate around the predicted range, so a single spurious
+   spike elsewhere in the minbin_freq..maxbin_freq window (e.g. the 0.200 m readings)
+   can't flip the reported range. After max_misses frames without a peak in the gate
+   the track is dropped and the search falls back to the full window.
+
+   In FMCW_Bulk_Data_Export.py (use_tracker) the gated search runs in addition to the
+   full-window find_strongest_peak(), which still provides the stored Range (m), so
+   enabling the tracker adds a search per frame rather than replacing one. The gated
+   result only drives the smoothed range.
+
+   Example:
+       tracker = AlphaBetaTracker(gate_m=0.15)
+       raw_range, smoothed_range = tracker.step(freq, s_dbfs, minbin_freq, maxbin_freq,
+                                                range_threshold, slope, signal_freq + freq_offset, t)
+'''
+
+import numpy as np
+from fmcw_processing import freq_to_range, range_to_freq
+
+class AlphaBetaTracker:
+    """ Alpha-beta filter on target range with gated peak search
+    Args:
+        alpha (float): Position gain, 0..1 (higher follows measurements more closely)
+        beta (float): Rate gain, 0..1
+        gate_m (float): Half-width (m) of the search gate around the predicted range
+        max_misses (int): Frames without a gated detection before the track is dropped
+        c (float): Speed of light used for the range/frequency conversion
+    """
+    def __init__(self, alpha=0.5, beta=0.1, gate_m=0.15, max_misses=3, c=3e8):
+        self.alpha = alpha
+        self.beta = beta
+        self.gate_m = gate_m
+        self.max_misses = max_misses
+        self.c = c
+        self.reset()
+
+    def reset(self):
+        self.range = None   # smoothed range (m), None while not tracking
+        self.rate = 0.0     # range rate (m/s)
+        self.misses = 0
+        self.last_time = None
+
+    @property
+    def tracking(self):
+        return self.range is not None
+
+    def predict(self, dt):
+        """ Predicted range dt seconds after the last update """
+        return self.range + self.rate * dt if self.tracking else None
+
+    def search_window(self, min_freq, max_freq, slope, ref_freq, dt):
+        """ (low, high) frequency window to search: the gate around the prediction, or the full window """
+        if not self.tracking:
+            return min_freq, max_freq
+        predicted = self.predict(dt)
+        low = range_to_freq(predicted - self.gate_m, slope, ref_freq, self.c)
+        high = range_to_freq(predicted + self.gate_m, slope, ref_freq, self.c)
+        return max(low, min_freq), min(high, max_freq)
+
+    def update(self, measured_range, dt):
+        """ Folds one measurement (None for a miss) into the track
+        Returns:
+            float: Smoothed range, None if there is no track
+        """
+        if measured_range is None:
+            if self.tracking:
+                self.misses += 1
+                if self.misses > self.max_misses:
+                    self.reset()
+                else:
+                    self.range = self.predict(dt)   # coast
+            return self.range
+        if not self.tracking:
+            self.range, self.rate, self.misses = measured_range, 0.0, 0
+            return self.range
+        predicted = self.predict(dt)
+        residual = measured_range - predicted
+        self.range = predicted + self.alpha * residual
+        if dt > 0:
+            self.rate += self.beta * residual / dt
+        self.misses = 0
+        return self.range
+
+    def step(self, frequencies, magnitudes, min_freq, max_freq, threshold, slope, ref_freq, timestamp):
+        """ Gated peak search plus tracker update for one frame
+        Args:
+            frequencies (np.array): Sorted frequency of each bin
+            magnitudes (np.array): Spectrum to search (dBFS, after CFAR if enabled)
+            min_freq, max_freq (float): Full search window (minbin_freq, maxbin_freq)
+            threshold (float): Peaks must be strictly above this (range_threshold)
+            slope (float): Chirp slope (Hz/s)
+            ref_freq (float): Zero-range frequency (signal_freq + freq_offset)
+            timestamp (float): Frame time (s)
+        Returns:
+            tuple: (raw_range, smoothed_range), either None when unavailable
+        """
+        dt = 0.0 if self.last_time is None else timestamp - self.last_time
+        self.last_time = timestamp
+        low, high = self.search_window(min_freq, max_freq, slope, ref_freq, dt)
+        # Bins are sorted, so the window is a contiguous slice
+        start = np.searchsorted(frequencies, low, side='left')
+        stop = np.searchsorted(frequencies, high, side='right')
+        raw_range = None
+        if stop > start:
+            peak = start + int(np.argmax(magnitudes[start:stop]))
+            if magnitudes[peak] > threshold:
+                raw_range = freq_to_range(frequencies[peak], slope, ref_freq, self.c)
+        return raw_range, self.update(raw_range, dt)
@@ -0,0 +1,100 @@
+'''
+   regenerate_images.py
+   Rebuilds the Images/ tree of the dataset, or a parallel tree, at any resolution
+   from the stored FilteredCSV magnitudes, so a new image size does not require
+   re-collecting at the radar. Files are processed across a process pool and
+   images that already exist in the output tree are skipped.
+
+   Usage: python3 regenerate_images.py --size 128
+'''
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import cv2 # type: ignore
+from dataset_io import iter_filtered_csvs, load_filtered_csv
+from imaging import magnitudes_to_image
+
+def image_path_for(csv_path, bin_dir, out_dir):
+    """Path of the image matching csv_path in the out_dir tree."""
+    name = os.path.splitext(os.path.basename(csv_path))[0] + ".png"
+    return os.path.join(out_dir, bin_dir, "Images", name)
+
+def regenerate_image(task):
+    """Render one FilteredCSV file to a PNG.
+
+    Args:
+        task (tuple): (csv_path, png_path, img_size, frames_per_image, mode)
+    Returns:
+        tuple: (png_path, error message or None)
+    """
+    csv_path, png_path, img_size, frames_per_image, mode = task
+    try:
+        _, _, magnitudes, _ = load_filtered_csv(csv_path)
+        image = magnitudes_to_image(magnitudes[:frames_per_image], img_size, mode)
+        # Write under a temporary name so an interrupted run never leaves a partial
+        # image that the skip check would accept
+        tmp_path = png_path[:-4] + ".tmp.png"
+        if not cv2.imwrite(tmp_path, image):
+            return png_path, "cv2.imwrite failed"
+        os.replace(tmp_path, png_path)
+    except Exception as e:
+        return png_path, str(e)
+    return png_path, None
+
+def regenerate_images(base_dir="DataSet", out_dir=None, img_size=56, frames_per_image=56,
+                      mode='auto', workers=None, overwrite=False):
+    """Regenerate every image of the dataset at img_size x img_size.
+
+    Args:
+        base_dir (str): Dataset root holding <bin>/FilteredCSV
+        out_dir (str): Root of the output tree, defaults to <base_dir>_<img_size>px
+        frames_per_image (int): Number of leading frames of each file to use
+        mode (str): Resampling mode, see imaging.downsample()
+        overwrite (bool): Re-render images that already exist
+    Returns:
+        tuple: (written, skipped, failed) counts
+    """
+    if out_dir is None:
+        out_dir = f"{base_dir.rstrip(os.sep)}_{img_size}px"
+
+    tasks = []
+    skipped = 0
+    for bin_dir, csv_path in iter_filtered_csvs(base_dir):
+        png_path = image_path_for(csv_path, bin_dir, out_dir)
+        if not overwrite and os.path.exists(png_path):
+            skipped += 1
+            continue
+        os.makedirs(os.path.dirname(png_path), exist_ok=True)
+        tasks.append((csv_path, png_path, img_size, frames_per_image, mode))
+
+    print(f"{len(tasks)} images to generate, {skipped} already present in {out_dir}")
+    written = failed = 0
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for png_path, error in executor.map(regenerate_image, tasks, chunksize=16):
+                if error:
+                    failed += 1
+                    print(f"Error generating {png_path}: {error}")
+                else:
+                    written += 1
+    return written, skipped, failed
+
+def main():
+    parser = argparse.ArgumentParser(description='Regenerate dataset images at a new resolution from FilteredCSV data.')
+    parser.add_argument('--dir', default='DataSet', help='Base directory to scan (default: DataSet)')
+    parser.add_argument('--out', default=None, help='Output tree root (default: <dir>_<size>px)')
+    parser.add_argument('--size', type=int, default=56, help='Image width and height in pixels (default: 56)')
+    parser.add_argument('--frames', type=int, default=56, help='Frames from each file to use (default: 56)')
+    parser.add_argument('--mode', default='auto', choices=['auto', 'mean', 'linear', 'nearest'],
+                        help='Resampling mode (default: auto, mean when shrinking and linear when enlarging)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--overwrite', action='store_true', help='Re-render images that already exist')
+    args = parser.parse_args()
+
+    written, skipped, failed = regenerate_images(args.dir, args.out, args.size, args.frames,
+                                                 args.mode, args.workers, args.overwrite)
+    print(f"\nGenerated {written} images, skipped {skipped}, failed {failed}")
+
+if __name__ == "__main__":
+    main()
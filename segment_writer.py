@@ -0,0 +1,164 @@
+'''
+   segment_writer.py
+   Rolling segment files for continuous capture. Frames go into arrays allocated once
+   (capacity frames x band bins); when a segment reaches segment_seconds, or the arrays
+   are full, it is written as a compact .npz (compact_storage.py format, absolute epoch
+   times) and the arrays are reused, so memory stays constant however long the capture
+   runs. After each write the oldest segments are deleted until the directory is back
+   under max_bytes.
+
+   segments.json in the output directory indexes the segments still on disk:
+       {"version": 1, "segments": [{"file", "start", "end", "frames", "bytes"}, ...]}
+   with start/end as epoch seconds of the first and last frame. The index is rewritten
+   atomically after every rotation, and a restarted writer picks it up and continues.
+
+   List the index:
+       python3 segment_writer.py --dir Continuous
+'''
+
+import argparse
+import datetime
+import json
+import os
+import time
+import numpy as np
+from compact_storage import save_compact
+
+INDEX_VERSION = 1
+INDEX_NAME = "segments.json"
+
+class SegmentWriter:
+    """ Fixed-duration, disk-budgeted segment files for an unbounded capture
+    Args:
+        directory (str): Output directory (created if missing)
+        freq (np.array): Frequency of each FFT bin
+        segment_seconds (float): Duration of each segment file
+        max_bytes (int): Disk budget for all segments; the oldest are deleted beyond it
+        band (tuple): (low, high) frequencies to keep, None for every bin
+        capacity (int): Frames buffered per segment; a segment is closed early when full
+        smoothed (bool): Also store smoothed (tracker) ranges
+        compress (bool): zlib-compress the segment files
+    """
+    def __init__(self, directory, freq, segment_seconds=60, max_bytes=500e6, band=None,
+                 capacity=4096, smoothed=False, compress=False):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.max_bytes = max_bytes
+        self.compress = compress
+        freq = np.asarray(freq)
+        if band is None:
+            self.band = slice(0, len(freq))
+        else:
+            keep = np.flatnonzero((freq >= band[0]) & (freq <= band[1]))
+            self.band = slice(keep[0], keep[-1] + 1)
+        self.freq = freq[self.band].copy()
+        self.times = np.empty(capacity)
+        self.magnitudes = np.empty((capacity, len(self.freq)))
+        self.ranges = np.empty(capacity)
+        self.smoothed_ranges = np.empty(capacity) if smoothed else None
+        self.count = 0
+        self.deleted = 0
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.segments = self.load_index()
+
+    def load_index(self):
+        """ Segments from an existing index whose files are still present """
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path) as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION:
+            return []
+        return [s for s in index["segments"] if os.path.exists(os.path.join(self.directory, s["file"]))]
+
+    def save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "segments": self.segments}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    @property
+    def total_bytes(self):
+        return sum(s["bytes"] for s in self.segments)
+
+    def append(self, timestamp, s_dbfs, peak_range=None, smoothed_range=None):
+        """ Adds one frame, rotating first if the current segment is due
+        Args:
+            timestamp (float): Frame time in epoch seconds
+            s_dbfs (np.array): Full spectrum (dBFS); only the band is kept
+            peak_range, smoothed_range (float): Ranges (m), None where unavailable
+        """
+        if self.count and (timestamp - self.times[0] >= self.segment_seconds or self.count == len(self.times)):
+            self.rotate()
+        i = self.count
+        self.times[i] = timestamp
+        self.magnitudes[i] = s_dbfs[self.band]
+        self.ranges[i] = np.nan if peak_range is None else peak_range
+        if self.smoothed_ranges is not None:
+            self.smoothed_ranges[i] = np.nan if smoothed_range is None else smoothed_range
+        self.count += 1
+
+    def rotate(self):
+        """ Writes the buffered frames as a segment and enforces the disk budget
+        Returns:
+            dict: Index entry of the new segment, None if nothing was buffered
+        """
+        if not self.count:
+            return None
+        n = self.count
+        start = datetime.datetime.fromtimestamp(self.times[0])
+        name = f"segment_{start.strftime('%Y%m%d_%H%M%S_%f')}.npz"
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp.npz"
+        smoothed = self.smoothed_ranges[:n] if self.smoothed_ranges is not None else None
+        save_compact(tmp_path, self.times[:n], self.freq, self.magnitudes[:n], self.ranges[:n],
+                     self.compress, smoothed)
+        os.replace(tmp_path, path)
+        entry = {"file": name, "start": float(self.times[0]), "end": float(self.times[n - 1]),
+                 "frames": n, "bytes": os.path.getsize(path)}
+        self.segments.append(entry)
+        self.count = 0
+        self.enforce_budget()
+        self.save_index()
+        return entry
+
+    def enforce_budget(self):
+        """ Deletes the oldest segments until the total is within max_bytes (the newest is always kept) """
+        while len(self.segments) > 1 and self.total_bytes > self.max_bytes:
+            oldest = self.segments.pop(0)
+            try:
+                os.remove(os.path.join(self.directory, oldest["file"]))
+            except FileNotFoundError:
+                pass
+            self.deleted += 1
+
+    def segments_between(self, start, end):
+        """ Index entries overlapping the epoch time span start..end """
+        return [s for s in self.segments if s["end"] >= start and s["start"] <= end]
+
+    def close(self):
+        """ Writes any buffered frames """
+        self.rotate()
+
+def main():
+    parser = argparse.ArgumentParser(description='List the segments of a continuous capture.')
+    parser.add_argument('--dir', default='Continuous', help='Segment directory (default: Continuous)')
+    args = parser.parse_args()
+
+    index_path = os.path.join(args.dir, INDEX_NAME)
+    if not os.path.exists(index_path):
+        print(f"No index in {args.dir}")
+        return
+    with open(index_path) as f:
+        segments = json.load(f)["segments"]
+    for s in segments:
+        start = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(s["start"]))
+        print(f"{s['file']}  {start}  {s['end'] - s['start']:7.1f} s  {s['frames']:6d} frames  {s['bytes'] / 1e6:7.2f} MB")
+    if segments:
+        span = segments[-1]["end"] - segments[0]["start"]
+        total = sum(s["bytes"] for s in segments)
+        print(f"{len(segments)} segments, {span / 3600:.2f} h, {total / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+'''
+   session_scheduler.py
+   Runs a queue of collection sessions on one configured radar. The Phaser, Pluto, PLL
+   and TDD are set up and the Tx waveform is uploaded once; then each session from the
+   schedule file is captured headless and streamed to DataSet/<bin>/ (CSV rows and
+   images are written as frames arrive, see fmcw_processing.SessionWriter) with its own
+   true_dist, bin label and num_img. Between sessions the scheduler pauses so the
+   target can be repositioned.
+
+   Usage: python3 session_scheduler.py schedule.json
+
+   Example schedule.json (distances in inches, like the Key Parameters of
+   FMCW_Bulk_Data_Export.py; "bin" overrides the label derived from namebin):
+       {
+           "radar": {"rx_gain": 60, "cfar": false},
+           "sessions": [
+               {"true_dist": 14.5, "namebin": 14.5, "num_img": 25},
+               {"true_dist": 28.5, "namebin": 26.5, "num_img": 25},
+               {"true_dist": 0, "bin": "no_object", "num_img": 25, "pause": false}
+           ]
+       }
+'''
+
+import argparse
+import datetime
+import json
+import os
+import numpy as np
+import radar_hardware
+from hw_config import CachedConfig
+from fmcw_processing import SessionWriter, compute_spectrum, find_strongest_peak, freq_to_range, range_to_freq
+from target_detection_dbfs import cfar
+
+RADAR_DEFAULTS = {
+    "sdr_ip": "ip:192.168.2.1",
+    "rpi_ip": "ip:phaser.local",
+    "sample_rate": 0.522e6,
+    "center_freq": .55e9,
+    "signal_freq": 100000,
+    "rx_gain": 60,
+    "output_freq": 10e9,
+    "chirp_bw": 1000e6,
+    "ramp_time": 450,
+    "num_chirps": 1,
+    "pri_pad_ms": 0.01,
+    "buffer_factor": 1.75,
+    "max_dist": 89 * 2.54 / 100,
+    "min_dist": 0,
+    "binmin": 0,
+    "binmax": 89 * 2.54 / 100,
+    "freq_offset": 25e3,
+    "range_threshold": -20,
+    "cfar": False,
+    "cfar_bias": 25,
+    "cfar_guard": 15,
+    "cfar_ref": 16,
+}
+
+SESSION_DEFAULTS = {
+    "img_size": 56,
+    "num_img": 25,
+    "window_stride": None,
+    "compact": False,
+    "pause": True,
+    "base_dir": "DataSet",
+}
+
+def session_label(session):
+    """Bin label used for the DataSet/<bin> directory and the file names."""
+    if session.get("bin"):
+        return session["bin"]
+    namebin = session["namebin"]
+    namebinup = namebin + 5.91
+    return f"{namebin * 2.54 / 100:.2f}-{namebinup * 2.54 / 100:.2f}"
+
+def load_schedule(path):
+    """Read a schedule file and fill in defaults.
+
+    Returns:
+        tuple: (radar settings dict, list of session dicts)
+    """
+    with open(path) as f:
+        schedule = json.load(f)
+    settings = dict(RADAR_DEFAULTS, **schedule.get("radar", {}))
+    sessions = []
+    for i, entry in enumerate(schedule.get("sessions", [])):
+        session = dict(SESSION_DEFAULTS, **entry)
+        if "true_dist" not in session or ("namebin" not in session and not session.get("bin")):
+            raise ValueError(f"Session {i+1} in {path} needs true_dist and either namebin or bin")
+        session["true_dist_m"] = session["true_dist"] * 2.54 / 100
+        session["label"] = session_label(session)
+        sessions.append(session)
+    return settings, sessions
+
+class Radar:
+    """ A configured Phaser + Pluto that captures one processed frame at a time
+    Args:
+        settings (dict): Radar settings, see RADAR_DEFAULTS
+        my_sdr, my_phaser, sdr_pins, tdd: Already configured devices. When my_sdr is
+            None the hardware is connected and configured here.
+    """
+    def __init__(self, settings, my_sdr=None, my_phaser=None, sdr_pins=None, tdd=None):
+        self.settings = settings
+        if my_sdr is None:
+            my_sdr, my_phaser = radar_hardware.connect(settings["sdr_ip"], settings["rpi_ip"])
+            self.phaser_config = radar_hardware.configure_phaser(my_phaser)
+            sample_rate, self.sdr_config = radar_hardware.configure_sdr(my_sdr, settings["sample_rate"], settings["center_freq"], settings["rx_gain"])
+            ramp_time, _ = radar_hardware.configure_pll(my_phaser, settings["output_freq"], settings["signal_freq"],
+                                                     settings["center_freq"], settings["chirp_bw"], settings["ramp_time"])
+            sdr_pins, tdd, pins_config, tdd_config = radar_hardware.configure_tdd(settings["sdr_ip"], settings["ramp_time"], settings["num_chirps"],
+                                                                                  settings["pri_pad_ms"])
+            self.configs = (pins_config, tdd_config)
+        else:
+            sample_rate = int(my_sdr.sample_rate)
+            ramp_time = int(my_phaser.freq_dev_time)
+            self.sdr_config, self.configs = CachedConfig(my_sdr), ()
+            self.phaser_config = CachedConfig(my_phaser)
+            pins_config = CachedConfig(sdr_pins) if sdr_pins is not None else None
+            tdd_config = CachedConfig(tdd, guard="enable") if tdd is not None else None
+        self.my_sdr, self.my_phaser, self.sdr_pins, self.tdd = my_sdr, my_phaser, sdr_pins, tdd
+        self.pins_config, self.tdd_config = pins_config, tdd_config
+        self.sample_rate, self.ramp_time = sample_rate, ramp_time
+
+        self.update_timing()
+        if settings.get("start_tx", True):
+            radar_hardware.start_tx(my_sdr, settings["signal_freq"], sample_rate)
+
+    def update_timing(self):
+        """ Derives the buffer size, FFT size and frequency axis from the current TDD timing """
+        settings, sample_rate = self.settings, self.sample_rate
+        self.timing = radar_hardware.chirp_timing(self.ramp_time, sample_rate, self.tdd.frame_length_ms,
+                                                  self.tdd.channel[0].on_ms, settings["num_chirps"], settings["buffer_factor"])
+        self.sdr_config.apply({"rx_buffer_size": self.timing["buffer_size"]})
+
+        c = 3e8
+        self.slope = settings["chirp_bw"] / self.timing["ramp_time_s"]
+        self.ref_freq = settings["signal_freq"] + settings["freq_offset"]
+        self.freq = np.linspace(-sample_rate/2, sample_rate/2, int(self.timing["fft_size"]))
+        self.upper_freq = range_to_freq(settings["max_dist"], self.slope, self.ref_freq, c)
+        self.lower_freq = range_to_freq(settings["min_dist"], self.slope, self.ref_freq, c)
+        self.maxbin_freq = range_to_freq(settings["binmax"], self.slope, self.ref_freq, c)
+        self.minbin_freq = range_to_freq(settings["binmin"], self.slope, self.ref_freq, c)
+
+    def set_timing(self, num_chirps=None, pri_pad_ms=None, buffer_factor=None):
+        """ Reprograms the TDD burst and receive buffer; arguments left as None keep their current value """
+        settings = self.settings
+        for key, value in (("num_chirps", num_chirps), ("pri_pad_ms", pri_pad_ms), ("buffer_factor", buffer_factor)):
+            if value is not None:
+                settings[key] = value
+        radar_hardware.configure_tdd(settings["sdr_ip"], settings["ramp_time"], settings["num_chirps"], settings["pri_pad_ms"],
+                                     self.pins_config, self.tdd_config)
+        self.update_timing()
+
+    def capture_raw(self):
+        """ Triggers one chirp burst and returns the summed Rx1 + Rx2 buffer """
+        self.my_phaser._gpios.gpio_burst = 0
+        self.my_phaser._gpios.gpio_burst = 1
+        self.my_phaser._gpios.gpio_burst = 0
+        data = self.my_sdr.rx()
+        return data[0] + data[1]
+
+    def spectrum(self, sum_data):
+        """ dBFS spectrum of one buffer or a (..., samples) stack of buffers """
+        timing = self.timing
+        return compute_spectrum(sum_data, timing["fft_size"], timing["start_offset_samples"],
+                                timing["good_ramp_samples"], self.settings["num_chirps"], timing["num_samples_frame"])
+
+    def capture_frame(self):
+        """ Triggers one chirp burst and processes it like update() does
+        Returns:
+            tuple: (s_dbfs, peak_range) with peak_range None when no peak passes range_threshold
+        """
+        return self.process(self.capture_raw())
+
+    def process(self, sum_data):
+        """ Spectrum, optional CFAR and peak search for one raw buffer, see capture_frame() """
+        s_dbfs = self.spectrum(sum_data)
+        data_to_use = s_dbfs
+        if self.settings["cfar"]:
+            _, targets = cfar(s_dbfs, self.settings["cfar_guard"], self.settings["cfar_ref"],
+                              self.settings["cfar_bias"], 'average')
+            data_to_use = targets.filled(-200)
+
+        peak_freq, peak_mag = find_strongest_peak(self.freq, data_to_use, self.minbin_freq, self.maxbin_freq)
+        if peak_freq is not None and peak_mag > self.settings["range_threshold"]:
+            return s_dbfs, freq_to_range(peak_freq, self.slope, self.ref_freq, 3e8)
+        return s_dbfs, None
+
+    def close(self):
+        radar_hardware.shutdown(self.my_sdr, self.tdd, self.sdr_pins, self.configs)
+
+def run_session(radar, session):
+    """ Captures one session, writing its CSV rows and images to <base_dir>/<label>/ as frames arrive
+    Returns:
+        int: Number of frames captured
+    """
+    img_size, num_img = session["img_size"], session["num_img"]
+    num_frames = img_size * num_img + num_img + 2
+    start_time = datetime.datetime.now()
+    session_dir = os.path.join(session["base_dir"], session["label"])
+    writer = SessionWriter(start_time, f"{session_dir}/Images", f"{session_dir}/CSV", radar.timing["fft_size"],
+                           radar.freq, radar.lower_freq, radar.upper_freq, img_size, num_img, session["true_dist_m"],
+                           session["label"], num_frames, session["window_stride"], session["compact"])
+    for index in range(num_frames):
+        s_dbfs, peak_range = radar.capture_frame()
+        writer.append((datetime.datetime.now() - start_time).total_seconds(), s_dbfs, peak_range)
+        if (index + 15) % img_size == 0:
+            print(f"Image {(index+16)//img_size} samples gathered")
+    writer.close()
+    return num_frames
+
+def run_schedule(radar, sessions, wait=input):
+    """ Runs every session in order, calling wait(prompt) before each one that asks to pause """
+    for number, session in enumerate(sessions, start=1):
+        if session["pause"]:
+            wait(f"Session {number}/{len(sessions)}: place the target at {session['true_dist_m']:.3f} m "
+                 f"(bin {session['label']}) and press Enter ")
+        print(f"Running session {number}/{len(sessions)}: {session['num_img']} images for bin {session['label']}")
+        num_frames = run_session(radar, session)
+        print(f"Session {number} finished ({num_frames} frames)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a schedule of collection sessions on one configured radar.')
+    parser.add_argument('schedule', help='JSON schedule file')
+    parser.add_argument('--no-pause', action='store_true', help='Do not wait for repositioning between sessions')
+    args = parser.parse_args()
+
+    settings, sessions = load_schedule(args.schedule)
+    if args.no_pause:
+        for session in sessions:
+            session["pause"] = False
+    if not sessions:
+        print("No sessions in schedule.")
+        return
+
+    radar = Radar(settings)
+    try:
+        run_schedule(radar, sessions)
+    finally:
+        radar.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+'''
+   shard_export.py
+   Packs the DataSet tree into a small number of fixed-size shard files plus a global
+   JSON index, so training nodes on a shared filesystem stream a few large files
+   instead of opening thousands of small CSV/PNG files every epoch.
+
+   Each shard is an uncompressed .npz holding, per sample: image (uint8 H x W x 3, RGB),
+   magnitudes (float32 frames x bins, dBFS), label (bin class index), truedist,
+   calcdist, session and bin name. Samples are shuffled with a fixed seed before
+   sharding so every shard mixes all bins.
+
+   Usage: python3 shard_export.py --num-shards 8 --out DataSetShards
+          then on each node: for sample in iter_worker_samples("DataSetShards/index.json", rank, world_size)
+'''
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from batch_loader import index_dataset, load_sample
+
+INDEX_NAME = "index.json"
+
+def load_bin_samples(samples):
+    """Load the image and magnitude matrix of every sample in one bin."""
+    images = np.stack([load_sample(s, "image") for s in samples])
+    magnitudes = np.stack([load_sample(s, "magnitude") for s in samples])
+    return images, magnitudes
+
+def write_shard(path, images, magnitudes, samples):
+    """Write one shard file under a temporary name, then move it into place."""
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path,
+             image=images,
+             magnitudes=magnitudes,
+             label=np.array([s["label"] for s in samples], dtype=np.int64),
+             truedist=np.array([s["truedist"] for s in samples], dtype=np.float32),
+             calcdist=np.array([s["calcdist"] for s in samples], dtype=np.float32),
+             session=np.array([s["session"] for s in samples]),
+             bin=np.array([s["bin_dir"] for s in samples]))
+    os.replace(tmp_path, path)
+
+def export_shards(base_dir="DataSet", out_dir="DataSetShards", num_shards=8, seed=0, workers=None):
+    """Pack the dataset into num_shards shards whose sizes differ by at most one sample.
+
+    Returns:
+        dict: The global index that was written to out_dir/index.json
+    """
+    samples = index_dataset(base_dir)
+    if not samples:
+        print("No data found.")
+        return None
+
+    # Read each bin in its own process
+    by_bin = {}
+    for i, s in enumerate(samples):
+        by_bin.setdefault(s["bin_dir"], []).append(i)
+    images = magnitudes = None
+    groups = list(by_bin.values())
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        loaded = executor.map(load_bin_samples, [[samples[i] for i in g] for g in groups])
+        for idx, (bin_images, bin_mags) in zip(groups, loaded):
+            if images is None:
+                images = np.empty((len(samples),) + bin_images.shape[1:], dtype=bin_images.dtype)
+                magnitudes = np.empty((len(samples),) + bin_mags.shape[1:], dtype=bin_mags.dtype)
+            images[idx] = bin_images
+            magnitudes[idx] = bin_mags
+            print(f"Loaded {len(idx)} samples from {samples[idx[0]]['bin_dir']}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    order = np.random.default_rng(seed).permutation(len(samples))
+    num_shards = min(num_shards, len(samples))
+    shards = []
+    start = 0
+    # array_split keeps shard sizes within one sample of each other
+    for shard_idx, members in enumerate(np.array_split(order, num_shards)):
+        name = f"shard-{shard_idx:05d}-of-{num_shards:05d}.npz"
+        shard_samples = [samples[i] for i in members]
+        write_shard(os.path.join(out_dir, name), images[members], magnitudes[members], shard_samples)
+        shards.append({"file": name, "num_samples": len(members), "first_sample": start,
+                       "sessions": sorted({s["session"] for s in shard_samples})})
+        start += len(members)
+        print(f"Wrote {name} ({len(members)} samples)")
+
+    index = {
+        "num_samples": len(samples),
+        "seed": seed,
+        "class_names": sorted(by_bin.keys()),
+        "image_shape": list(images.shape[1:]),
+        "magnitude_shape": list(magnitudes.shape[1:]),
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, INDEX_NAME), "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+def load_index(index_path):
+    with open(index_path) as f:
+        return json.load(f)
+
+def shards_for_worker(index, rank, world_size):
+    """Shard files assigned to worker `rank` of `world_size` (round robin, deterministic)."""
+    if not 0 <= rank < world_size:
+        raise ValueError(f"rank {rank} out of range for world_size {world_size}")
+    return [shard["file"] for shard in index["shards"][rank::world_size]]
+
+def iter_worker_samples(index_path, rank=0, world_size=1):
+    """Yield one dict per sample from the shards assigned to this worker."""
+    index = load_index(index_path)
+    shard_dir = os.path.dirname(index_path)
+    for name in shards_for_worker(index, rank, world_size):
+        with np.load(os.path.join(shard_dir, name)) as shard:
+            fields = {key: shard[key] for key in shard.files}
+        for i in range(len(fields["label"])):
+            yield {key: value[i] for key, value in fields.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack the DataSet into fixed-size shard files with a global index.')
+    parser.add_argument('--dir', default='DataSet', help='Base directory to scan (default: DataSet)')
+    parser.add_argument('--out', default='DataSetShards', help='Output directory (default: DataSetShards)')
+    parser.add_argument('--num-shards', type=int, default=8, help='Number of shard files (default: 8)')
+    parser.add_argument('--seed', type=int, default=0, help='Shuffle seed (default: 0)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    index = export_shards(args.dir, args.out, args.num_shards, args.seed, args.workers)
+    if index:
+        print(f"\nPacked {index['num_samples']} samples into {len(index['shards'])} shards in {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+'''
+   stage_timing.py
+   Low-overhead per-stage latency probes for the acquisition loop. Each stage keeps
+   its most recent latencies in a preallocated ring buffer, so recording a sample is
+   one perf_counter_ns() call and one array write. Percentiles are only computed when
+   stats are dumped or displayed.
+
+   Example:
+       timer = StageTimer()
+       timer.start_frame()
+       data = my_sdr.rx()
+       timer.lap("rx")
+       ...
+       timer.end_frame()
+       timer.maybe_dump("stage_stats.json")
+
+   Counters:
+       frames_processed    frames that went through the whole loop
+       frames_discarded    buffers read after the session ended and thrown away
+       frames_over_budget  processed frames slower than frame_budget_ms (if set)
+       rx_errors           failed receive calls, counted by the caller with count("rx_errors")
+'''
+
+import json
+import os
+import time
+import numpy as np
+
+class StageTimer:
+    """ Rolling per-stage latency statistics plus simple event counters
+    Args:
+        window (int): Number of recent samples kept per stage
+        dump_interval_s (float): Minimum time between maybe_dump() writes
+        frame_budget_ms (float): Frames slower than this count as over budget, None to disable
+    """
+    def __init__(self, window=1000, dump_interval_s=5.0, frame_budget_ms=None):
+        self.window = window
+        self.dump_interval_s = dump_interval_s
+        self.frame_budget_ns = None if frame_budget_ms is None else int(frame_budget_ms * 1e6)
+        self.samples = {}   # stage name -> ring buffer of latencies in ns
+        self.filled = {}    # stage name -> number of samples ever recorded
+        self.counters = {"frames_processed": 0, "frames_discarded": 0, "frames_over_budget": 0, "rx_errors": 0}
+        self.stage_order = []
+        self.started = time.time()
+        self.last_dump = time.monotonic()
+        self.frame_start = self.last_lap = time.perf_counter_ns()
+
+    def start_frame(self):
+        """Mark the start of a frame; the next lap() measures from here."""
+        self.frame_start = self.last_lap = time.perf_counter_ns()
+
+    def lap(self, stage):
+        """Record the time since the previous lap (or start_frame) against stage."""
+        now = time.perf_counter_ns()
+        self.record(stage, now - self.last_lap)
+        self.last_lap = now
+
+    def end_frame(self, discarded=False):
+        """Record the whole-frame latency and count the frame as processed (or over budget) or discarded."""
+        latency = time.perf_counter_ns() - self.frame_start
+        self.record("frame", latency)
+        if discarded:
+            self.count("frames_discarded")
+            return
+        self.count("frames_processed")
+        if self.frame_budget_ns is not None and latency > self.frame_budget_ns:
+            self.count("frames_over_budget")
+
+    def record(self, stage, latency_ns):
+        buffer = self.samples.get(stage)
+        if buffer is None:
+            buffer = self.samples[stage] = np.zeros(self.window, dtype=np.int64)
+            self.filled[stage] = 0
+            self.stage_order.append(stage)
+        buffer[self.filled[stage] % self.window] = latency_ns
+        self.filled[stage] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def stats(self):
+        """Summary of every stage in milliseconds plus the counters.
+
+        Returns:
+            dict: stages -> {count, mean_ms, p50_ms, p99_ms, max_ms} over the rolling
+                window, counters, and uptime_s
+        """
+        stages = {}
+        for stage in self.stage_order:
+            recent = self.samples[stage][:min(self.filled[stage], self.window)] / 1e6
+            p50, p99 = np.percentile(recent, [50, 99])
+            stages[stage] = {
+                "count": self.filled[stage],
+                "mean_ms": float(np.mean(recent)),
+                "p50_ms": float(p50),
+                "p99_ms": float(p99),
+                "max_ms": float(np.max(recent)),
+            }
+        return {"uptime_s": time.time() - self.started, "counters": dict(self.counters), "stages": stages}
+
+    def summary_text(self):
+        """Short multi-line readout for a GUI label or the console."""
+        stats = self.stats()
+        lines = [f"{stage}: p50 {s['p50_ms']:.2f} ms  p99 {s['p99_ms']:.2f} ms"
+                 for stage, s in stats["stages"].items()]
+        counters = stats["counters"]
+        lines.append(f"frames: {counters['frames_processed']} processed, {counters['frames_over_budget']} over budget, "
+                     f"{counters['rx_errors']} rx errors, {counters['frames_discarded']} discarded")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write stats() to path as JSON (or plain text if path ends in .txt)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            if path.endswith(".txt"):
+                f.write(self.summary_text() + "\n")
+            else:
+                json.dump(self.stats(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def maybe_dump(self, path):
+        """dump() at most once every dump_interval_s seconds. Returns True if written."""
+        now = time.monotonic()
+        if now - self.last_dump < self.dump_interval_s:
+            return False
+        self.last_dump = now
+        self.dump(path)
+        return True
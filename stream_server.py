@@ -0,0 +1,217 @@
+'''
+   stream_server.py
+   Optional TCP server that streams live frames from the acquisition loop to remote
+   clients. The server runs an asyncio loop in a background thread; publish() is called
+   from the acquisition loop, encodes the frame once and hands it to every client's
+   bounded queue. When a client's queue is full the oldest message is dropped, so a slow
+   or stalled client never holds up capture.
+
+   Protocol: every message is a 5-byte header (uint32 body length, uint8 type) followed by
+   the body, little-endian.
+       HELLO     (server, on connect)  uint32 num_bins, float64[num_bins] band frequencies (Hz)
+       SPECTRUM  (server)              uint64 seq, float64 timestamp (s), float64 peak range (m,
+                                       NaN if none), float32[num_bins] dBFS over the range band
+       DETECTION (server)              uint64 seq, float64 timestamp (s), float64 peak range (m)
+       SUBSCRIBE (client)              uint8 SUBSCRIBE_SPECTRA or SUBSCRIBE_DETECTIONS
+   New clients get detections only until they subscribe to spectra.
+
+   Watch a stream: python3 stream_server.py 192.168.0.20:5005 --spectra
+'''
+
+import argparse
+import asyncio
+import collections
+import struct
+import threading
+import numpy as np
+
+HELLO, SPECTRUM, DETECTION, SUBSCRIBE = 0, 1, 2, 16
+SUBSCRIBE_DETECTIONS, SUBSCRIBE_SPECTRA = 0, 1
+
+HEADER = struct.Struct("<IB")
+FRAME = struct.Struct("<Qdd")
+
+def encode_message(msg_type, body):
+    return HEADER.pack(len(body), msg_type) + body
+
+def decode_message(msg_type, body):
+    """ Decodes a message body
+    Returns:
+        dict: Fields of the message (see the protocol in the module docstring)
+    """
+    if msg_type == HELLO:
+        num_bins = struct.unpack_from("<I", body)[0]
+        return {"type": "hello", "freq": np.frombuffer(body, np.float64, num_bins, 4)}
+    if msg_type in (SPECTRUM, DETECTION):
+        seq, timestamp, peak_range = FRAME.unpack_from(body)
+        message = {"type": "spectrum" if msg_type == SPECTRUM else "detection", "seq": seq,
+                   "timestamp": timestamp, "peak_range": None if np.isnan(peak_range) else peak_range}
+        if msg_type == SPECTRUM:
+            message["magnitudes"] = np.frombuffer(body, np.float32, offset=FRAME.size)
+        return message
+    if msg_type == SUBSCRIBE:
+        return {"type": "subscribe", "mode": body[0]}
+    raise ValueError(f"Unknown message type {msg_type}")
+
+async def read_message(reader):
+    """ Reads and decodes one message from an asyncio StreamReader """
+    length, msg_type = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return decode_message(msg_type, await reader.readexactly(length))
+
+def subscribe_message(mode):
+    return encode_message(SUBSCRIBE, bytes([mode]))
+
+class _Client:
+    def __init__(self, queue_size):
+        self.queue = collections.deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.mode = SUBSCRIBE_DETECTIONS
+        self.dropped = 0
+        self.task = asyncio.current_task()
+        self.listener = None
+
+    def put(self, message):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(message)
+        self.ready.set()
+
+class StreamServer:
+    """ Streams per-frame spectra and detections to TCP clients
+    Args:
+        freq (np.array): Frequency of every FFT bin
+        lower_freq, upper_freq (float): Range band sent in SPECTRUM messages
+        host (str): Interface to listen on
+        port (int): TCP port, 0 to pick a free one (see .port after start())
+        queue_size (int): Messages buffered per client before the oldest is dropped
+    """
+    def __init__(self, freq, lower_freq, upper_freq, host="0.0.0.0", port=5005, queue_size=64):
+        freq = np.asarray(freq)
+        self.band = np.flatnonzero((freq >= lower_freq) & (freq <= upper_freq))
+        self.hello = encode_message(HELLO, struct.pack("<I", len(self.band)) + freq[self.band].astype(np.float64).tobytes())
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.clients = set()
+        self.seq = 0
+        self.loop = None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """ Starts the server thread and returns once it is listening """
+        started = threading.Event()
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self._server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+            self.loop.close()
+        self._thread = threading.Thread(target=run, name="stream_server", daemon=True)
+        self._thread.start()
+        started.wait()
+        print(f"Streaming frames on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        """ Disconnects every client, closes the listening socket and ends the server thread """
+        if self.loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout=5)
+            finally:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join(timeout=5)
+                self.loop = None
+
+    async def _shutdown(self):
+        self._server.close()
+        clients = list(self.clients)
+        for client in clients:
+            client.task.cancel()   # each handler cancels its listener and closes its writer on the way out
+        await asyncio.gather(*(client.task for client in clients), *(client.listener for client in clients),
+                             return_exceptions=True)
+        await self._server.wait_closed()
+
+    def publish(self, timestamp, s_dbfs, peak_range=None):
+        """ Queues one frame for every client. Safe to call from the acquisition thread; never blocks. """
+        if not self.clients or self.loop is None:
+            self.seq += 1
+            return
+        header = FRAME.pack(self.seq, timestamp, np.nan if peak_range is None else peak_range)
+        detection = encode_message(DETECTION, header)
+        spectrum = None
+        if any(client.mode == SUBSCRIBE_SPECTRA for client in list(self.clients)):
+            spectrum = encode_message(SPECTRUM, header + np.asarray(s_dbfs)[self.band].astype(np.float32).tobytes())
+        self.seq += 1
+        self.loop.call_soon_threadsafe(self._fan_out, detection, spectrum)
+
+    def _fan_out(self, detection, spectrum):
+        for client in self.clients:
+            client.put(spectrum if client.mode == SUBSCRIBE_SPECTRA and spectrum is not None else detection)
+
+    async def _handle(self, reader, writer):
+        client = _Client(self.queue_size)
+        client.put(self.hello)
+        self.clients.add(client)
+        listener = client.listener = asyncio.ensure_future(self._listen(reader, client))
+        try:
+            while not listener.done():
+                await client.ready.wait()
+                client.ready.clear()
+                while client.queue:
+                    writer.write(client.queue.popleft())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(client)
+            listener.cancel()
+            writer.close()
+
+    async def _listen(self, reader, client):
+        """ Applies SUBSCRIBE messages until the client disconnects """
+        try:
+            while True:
+                message = await read_message(reader)
+                if message["type"] == "subscribe":
+                    client.mode = message["mode"]
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            client.ready.set()   # wake the writer so it sees the disconnect
+
+    def stats(self):
+        """ Queue depth and dropped message count per connected client """
+        return [{"mode": client.mode, "queued": len(client.queue), "dropped": client.dropped}
+                for client in list(self.clients)]
+
+async def watch(host, port, spectra):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(subscribe_message(SUBSCRIBE_SPECTRA if spectra else SUBSCRIBE_DETECTIONS))
+    await writer.drain()
+    while True:
+        message = await read_message(reader)
+        if message["type"] == "hello":
+            print(f"Band: {len(message['freq'])} bins, {message['freq'][0]:.0f}-{message['freq'][-1]:.0f} Hz")
+            continue
+        peak = "N/A" if message["peak_range"] is None else f"{message['peak_range']:.2f} m"
+        line = f"#{message['seq']} t={message['timestamp']:.3f}s range {peak}"
+        if message["type"] == "spectrum":
+            line += f", max {message['magnitudes'].max():.1f} dBFS"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Print frames from a running stream server.')
+    parser.add_argument('address', help='host:port of the acquisition tool')
+    parser.add_argument('--spectra', action='store_true', help='Subscribe to full spectra instead of detections only')
+    args = parser.parse_args()
+    host, port = args.address.rsplit(":", 1)
+    try:
+        asyncio.run(watch(host, int(port), args.spectra))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,6 @@
 '''
 
 import numpy as np
-from scipy.interpolate import interp1d
 
 def cfar(X_k, num_guard_cells, num_ref_cells, bias=1, cfar_method='average',
     fa_rate=0.2):
@@ -53,3 +52,119 @@ def cfar(X_k, num_guard_cells, num_ref_cells, bias=1, cfar_method='average',
         return cfar_values, targets_only
     
     
+
+def cfar_batch(X, num_guard_cells, num_ref_cells, bias=1, cfar_method='average',
+    fa_rate=0.2):
+    """ Vectorized cfar() over the last axis of X (e.g. a frames x bins array)
+    Reference window sums come from cumulative sums, so the cost no longer scales
+    with the window size. Matches cfar() cell for cell, including filling the edge
+    cells with the smallest computed threshold.
+    Args:
+        X (np.array): dBFS magnitudes, cells along the last axis
+    Returns:
+        tuple: (cfar_values, targets_only[, noise_variance]) shaped like X
+    """
+    X = np.asarray(X, dtype=float)
+    N = X.shape[-1]
+    span = num_guard_cells + num_ref_cells
+    cfar_values = np.full(X.shape, np.nan)
+    noise_variance = np.full(X.shape, np.nan)
+    centers = np.arange(span, N - span)
+
+    if centers.size:
+        zeros = np.zeros(X.shape[:-1] + (1,))
+        csum = np.concatenate((zeros, np.cumsum(X, axis=-1)), axis=-1)
+        lower_sum = csum[..., centers - num_guard_cells] - csum[..., centers - span]
+        upper_sum = csum[..., centers + span + 1] - csum[..., centers + num_guard_cells + 1]
+        lower_mean = lower_sum / num_ref_cells
+        upper_mean = upper_sum / num_ref_cells
+
+        if (cfar_method == 'average'):
+            output = (lower_sum + upper_sum) / (2 * num_ref_cells) + bias
+        elif (cfar_method == 'greatest'):
+            output = np.maximum(lower_mean, upper_mean) + bias
+        elif (cfar_method == 'smallest'):
+            output = np.minimum(lower_mean, upper_mean) + bias
+        elif (cfar_method == 'false_alarm'):
+            csum2 = np.concatenate((zeros, np.cumsum(X**2, axis=-1)), axis=-1)
+            refs_sq = (csum2[..., centers - num_guard_cells] - csum2[..., centers - span]
+                + csum2[..., centers + span + 1] - csum2[..., centers + num_guard_cells + 1])
+            noise_variance[..., centers] = refs_sq / (2 * num_ref_cells)
+            output = (noise_variance[..., centers] * -2 * np.log(fa_rate))**0.5
+        else:
+            raise Exception('No CFAR method received')
+
+        cfar_values[..., centers] = output
+        edge_fill = np.min(output, axis=-1, keepdims=True)
+        cfar_values = np.where(np.isnan(cfar_values), edge_fill, cfar_values)
+        targets_only = np.ma.masked_array(np.copy(X), mask=abs(X) > abs(cfar_values))
+    else:
+        # Window wider than the spectrum: cfar() leaves every cell unmasked
+        targets_only = np.ma.masked_array(np.copy(X), mask=np.zeros(X.shape, dtype=bool))
+
+    if (cfar_method == 'false_alarm'):
+        return cfar_values, targets_only, noise_variance
+    else:
+        return cfar_values, targets_only
+
+def find_peaks_batch(frequencies, magnitudes, min_freq, max_freq, num_peaks=1,
+    min_separation=0, threshold=None, ref_freq=0, slope=None, c=3e8):
+    """ Find the num_peaks strongest peaks of every frame within a frequency range
+    Args:
+        frequencies (np.array): Frequency of each bin
+        magnitudes (np.array): Magnitudes shaped (frames, bins), or a single frame
+        min_freq, max_freq: Frequency range to search (inclusive)
+        num_peaks (int): Number of peaks to return per frame
+        min_separation (int): Peaks closer than this many bins to a stronger peak are skipped
+        threshold (float): Only peaks strictly above this magnitude are returned
+        ref_freq (float): Frequency of zero range (signal_freq + freq_offset)
+        slope (float): Chirp slope in Hz/s, used to convert peak frequency to range
+        c (float): Speed of light
+    Returns:
+        tuple: (indices, peak_freqs, peak_ranges, peak_mags), each shaped (frames, num_peaks)
+            and ordered strongest first. Missing peaks have index -1 and NaN values.
+            Indices refer to the full frequencies array.
+    """
+    frequencies = np.asarray(frequencies)
+    magnitudes = np.atleast_2d(np.asarray(magnitudes, dtype=float))
+    num_frames = magnitudes.shape[0]
+    rows = np.arange(num_frames)[:, np.newaxis]
+    gate = np.flatnonzero((frequencies >= min_freq) & (frequencies <= max_freq))
+
+    gate_idx = np.zeros((num_frames, num_peaks), dtype=int)
+    peak_mags = np.full((num_frames, num_peaks), -np.inf)
+    if gate.size:
+        gated = magnitudes[:, gate]  # fancy indexing copies, so gated can be edited in place
+        gated[np.isnan(gated)] = -np.inf
+        if threshold is not None:
+            gated[gated <= threshold] = -np.inf
+
+        if min_separation <= 1:
+            k = min(num_peaks, gate.size)
+            if k < gate.size:
+                top = np.argpartition(-gated, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(gate.size), (num_frames, gate.size))
+            order = np.argsort(-gated[rows, top], axis=1, kind='stable')
+            gate_idx[:, :k] = top[rows, order]
+            peak_mags[:, :k] = gated[rows, gate_idx[:, :k]]
+        else:
+            # Greedy non-maximum suppression, one vectorized pass per peak
+            cells = np.arange(gate.size)
+            for n in range(num_peaks):
+                best = np.argmax(gated, axis=1)
+                gate_idx[:, n] = best
+                peak_mags[:, n] = gated[rows[:, 0], best]
+                gated[np.abs(cells - best[:, np.newaxis]) < min_separation] = -np.inf
+    else:
+        gate = np.zeros(1, dtype=int)
+
+    found = np.isfinite(peak_mags)
+    indices = np.where(found, gate[gate_idx], -1)
+    peak_freqs = np.where(found, frequencies[gate[gate_idx]], np.nan)
+    peak_mags = np.where(found, peak_mags, np.nan)
+    if slope:
+        peak_ranges = (peak_freqs - ref_freq) * c / (2 * slope)
+    else:
+        peak_ranges = np.full(peak_freqs.shape, np.nan)
+    return indices, peak_freqs, peak_ranges, peak_mags
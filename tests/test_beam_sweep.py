@@ -0,0 +1,64 @@
+'''beam_sweep sequencing against a recording stub phaser.'''
+
+import numpy as np
+import pytest
+from beam_sweep import run_sweeps, steer_phase_delta
+from timing_tuner import simulated_radar
+
+ANGLES = [-10.0, 0.0, 10.0]
+
+def phase_writes(log):
+    return [entry[2] for entry in log if entry[:2] == ("call", "phaser.set_chan_phase")]
+
+def expected_phases(radar, angle):
+    delta = steer_phase_delta(angle, radar.settings["output_freq"], radar.my_phaser.element_spacing)
+    return [(ch, delta * ch) for ch in range(8)]
+
+def test_sweep_steers_before_each_capture_and_returns_to_boresight():
+    radar = simulated_radar()
+    log = radar.my_phaser.log
+    capture_raw = radar.capture_raw
+    def marked_capture():
+        log.append(("capture",))
+        return capture_raw()
+    radar.capture_raw = marked_capture
+
+    maps = run_sweeps(radar, ANGLES, frames_per_angle=2)
+
+    # One block of phase writes per angle, then K captures, then the return to 0 degrees
+    steps, current = [], []
+    for entry in log:
+        if entry[0] == "capture":
+            if current:
+                steps.append(current)
+                current = []
+        elif entry[:2] == ("call", "phaser.set_chan_phase"):
+            current.append(entry[2])
+    steps.append(current)
+    assert len(steps) == len(ANGLES) + 1
+    assert sum(entry == ("capture",) for entry in log) == len(ANGLES) * 2
+
+    # CachedConfig skips channels whose phase is unchanged (channel 0 is always 0)
+    applied = {}
+    for step, angle in zip(steps, ANGLES + [0.0]):
+        wanted = [(ch, value) for ch, value in expected_phases(radar, angle) if applied.get(ch) != value]
+        assert step == wanted
+        applied.update(wanted)
+    assert steps[-1] == [(ch, 0.0) for ch in range(1, 8)]
+    assert all(value == 0 for value in applied.values())
+
+    assert maps["magnitudes"].shape == (1, len(ANGLES), len(maps["ranges"]))
+    assert np.isfinite(maps["magnitudes"]).all()
+
+def test_restores_boresight_when_a_capture_fails():
+    radar = simulated_radar()
+    calls = []
+    def failing_capture():
+        calls.append(len(calls))
+        if len(calls) == 3:
+            raise OSError("rx failed")
+        return np.zeros(1)
+    radar.capture_raw = failing_capture
+    with pytest.raises(OSError):
+        run_sweeps(radar, ANGLES, frames_per_angle=2)
+    assert phase_writes(radar.my_phaser.log)[-7:] == [(ch, 0.0) for ch in range(1, 8)]
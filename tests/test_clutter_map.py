@@ -0,0 +1,43 @@
+'''ClutterMap save/load across frequency axes.'''
+
+import numpy as np
+from clutter_map import ClutterMap, session_of, split_sessions
+
+FULL = np.arange(256) * 522000 / 256
+BAND = FULL[46:106]
+
+def calibrated(level_dbfs=-60.0):
+    clutter = ClutterMap(BAND)
+    clutter.update(np.full(len(BAND), level_dbfs), alpha=0)
+    clutter.sources = ["0101-000000_256x57.csv"]
+    return clutter
+
+def test_load_onto_wider_axis_only_subtracts_in_band(tmp_path):
+    calibrated().save(tmp_path / "map.npz")
+    clutter = ClutterMap.load(tmp_path / "map.npz", FULL)
+    inside = np.zeros(len(FULL), dtype=bool)
+    inside[46:106] = True
+    assert np.allclose(clutter.background[inside], 1e-6)
+    assert not clutter.background[~inside].any()
+    clean = clutter.subtract(np.full(len(FULL), -50.0))
+    assert np.allclose(clean[~inside], -50.0)
+    assert np.all(clean[inside] < -50.0)
+    assert clutter.sources == ["0101-000000_256x57.csv"]
+
+def test_load_on_same_axis_is_unchanged(tmp_path):
+    original = calibrated()
+    original.save(tmp_path / "map.npz")
+    clutter = ClutterMap.load(tmp_path / "map.npz", BAND)
+    assert np.array_equal(clutter.background, original.background)
+    assert clutter.frames == 1
+
+def test_holdout_splits_whole_sessions():
+    paths = [f"DataSet/no_object/FilteredCSV/{session}_truedist0.000_calcdist0.200_binemptym_img{i}.csv"
+             for session in ("0318-120000", "0318-123126", "0318-130000") for i in (1, 2, 10)]
+    calibration, held_out, sessions = split_sessions(paths, 0.5)
+    assert sessions == ["0318-130000"]
+    assert len(calibration) == 6 and len(held_out) == 3
+    assert {session_of(p) for p in calibration}.isdisjoint(session_of(p) for p in held_out)
+    # One session can't be split: nothing is held out rather than splitting its files
+    calibration, held_out, sessions = split_sessions(paths[3:6], 0.5)
+    assert (len(calibration), held_out, sessions) == (3, [], [])
@@ -0,0 +1,33 @@
+'''compact_storage round trips.'''
+
+import numpy as np
+from compact_storage import MAG_STEP, load_compact, save_compact
+
+def session(frames=57, bins=60):
+    rng = np.random.default_rng(0)
+    times = np.cumsum(rng.uniform(0.02, 0.04, frames))
+    freq = 100e3 + np.arange(bins) * 522000 / 256
+    magnitudes = rng.uniform(-90, -10, (frames, bins))
+    ranges = rng.uniform(0.3, 1.8, frames)
+    ranges[::7] = np.nan
+    return times, freq, magnitudes, ranges
+
+def test_round_trip_within_error_bounds(tmp_path):
+    times, freq, magnitudes, ranges = session()
+    save_compact(tmp_path / "s.npz", times, freq, magnitudes, ranges)
+    t, f, m, r = load_compact(tmp_path / "s.npz")
+    assert np.max(np.abs(t - times)) <= 0.5e-6 + 1e-12
+    assert np.array_equal(f, freq)
+    assert np.max(np.abs(m - magnitudes)) <= MAG_STEP / 2 + 1e-9
+    assert np.allclose(r, ranges, rtol=1e-6, equal_nan=True)
+
+def test_smoothed_ranges_are_returned_on_request(tmp_path):
+    times, freq, magnitudes, ranges = session()
+    smoothed = np.where(np.isnan(ranges), np.nan, ranges + 0.01)
+    save_compact(tmp_path / "tracked.npz", times, freq, magnitudes, ranges, smoothed_ranges=smoothed)
+    save_compact(tmp_path / "plain.npz", times, freq, magnitudes, ranges)
+    *_, r, s = load_compact(tmp_path / "tracked.npz", smoothed=True)
+    assert np.allclose(s, smoothed, rtol=1e-6, equal_nan=True)
+    assert np.allclose(r, ranges, rtol=1e-6, equal_nan=True)
+    assert load_compact(tmp_path / "plain.npz", smoothed=True)[4] is None
+    assert len(load_compact(tmp_path / "tracked.npz")) == 4
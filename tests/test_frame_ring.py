@@ -0,0 +1,38 @@
+'''FrameRing writer/reader in one process.'''
+
+import os
+import numpy as np
+from multiprocessing import shared_memory
+from frame_ring import FrameRing, FrameRingReader
+
+def ring_name(tag):
+    return f"fmcw_test_{tag}_{os.getpid()}"
+
+def test_reader_follows_and_counts_overruns():
+    ring = FrameRing(ring_name("overrun"), 8, capacity=4)
+    try:
+        reader = FrameRingReader(ring.name)
+        ring.publish(0.1, np.full(8, -50.0), 0.5)
+        seq, timestamp, spectrum, peak_range = reader.read(copy=True)
+        assert (seq, timestamp, peak_range) == (0, 0.1, 0.5)
+        assert np.array_equal(spectrum, np.full(8, -50.0))
+        assert reader.read() is None
+        for i in range(1, 7):
+            ring.publish(0.1 * (i + 1), np.full(8, -50.0 + i))
+        assert reader.read(copy=True)[0] == 3
+        assert reader.overruns == 2
+    finally:
+        ring.close()
+
+def test_stale_block_from_a_crashed_run_is_replaced():
+    name = ring_name("stale")
+    stale = shared_memory.SharedMemory(name=name, create=True, size=64)   # never unlinked, like after a crash
+    stale.close()
+    ring = FrameRing(name, 16, capacity=8)
+    try:
+        ring.publish(1.0, np.zeros(16), None)
+        reader = FrameRingReader(name, from_start=True)
+        assert reader.fft_size == 16 and reader.capacity == 8
+        assert reader.read(copy=True)[3] is None
+    finally:
+        ring.close()
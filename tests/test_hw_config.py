@@ -0,0 +1,60 @@
+'''Stub-device checks for hw_config.CachedConfig and the radar_hardware setup steps.'''
+
+import radar_hardware
+from hw_config import TDD_CHANNEL_DEFAULTS, CachedConfig, RecordingDevice
+
+def writes(log):
+    return [entry[1:] for entry in log if entry[0] == "set"]
+
+def test_apply_only_writes_changed_attributes():
+    device = RecordingDevice("dev")
+    config = CachedConfig(device)
+    config.apply({"a": 1, "b": 2})
+    device.log.clear()
+    assert config.apply({"a": 1, "b": 2}) == []
+    assert config.apply({"a": 1, "b": 3}) == ["b"]
+    assert writes(device.log) == [("dev.b", 3)]
+    assert config.skipped == 3
+
+def test_range_res_change_writes_only_deviation_and_latch():
+    phaser = RecordingDevice("phaser")
+    ramp_time, pll = radar_hardware.configure_pll(phaser, 10e9, 100000, .55e9, 1000e6, 450)
+    assert ramp_time == 450
+    phaser.log.clear()
+    # What set_range_res() does when the bandwidth slider moves
+    pll.apply({"freq_dev_range": int(500e6 / 4)})
+    assert writes(phaser.log) == [("phaser.freq_dev_range", int(500e6 / 4)), ("phaser.enable", 0)]
+    phaser.log.clear()
+    pll.apply({"freq_dev_range": int(500e6 / 4)})
+    assert phaser.log == []
+    # A full PLL setup at the new bandwidth only adds the step size, which depends on it
+    radar_hardware.configure_pll(phaser, 10e9, 100000, .55e9, 500e6, 450, config=pll)
+    assert writes(phaser.log) == [("phaser.freq_dev_step", int(500e6 / 4 / 450)), ("phaser.enable", 0)]
+
+def test_tdd_reprogram_is_guarded_and_diffed():
+    log = []
+    pins = CachedConfig(RecordingDevice("pins", log=log))
+    tdd = CachedConfig(RecordingDevice("tdd", 3, log=log, channel_attrs=TDD_CHANNEL_DEFAULTS), guard="enable")
+    radar_hardware.configure_tdd("ip:stub", 450, 1, 0.01, pins, tdd)
+    log.clear()
+    radar_hardware.configure_tdd("ip:stub", 450, 1, 0.01, pins, tdd)
+    assert log == []
+    radar_hardware.configure_tdd("ip:stub", 450, 2, 0.01, pins, tdd)
+    assert writes(log) == [("tdd.enable", False), ("tdd.burst_count", 2), ("tdd.enable", True)]
+
+def test_phaser_setup_calls_once():
+    phaser = RecordingDevice("phaser", 8, ["_gpios"])
+    config = radar_hardware.configure_phaser(phaser)
+    phaser.log.clear()
+    radar_hardware.configure_phaser(phaser, config=config)
+    assert phaser.log == []
+    radar_hardware.set_beam_phase_diff(config, 10)
+    calls = [entry for entry in phaser.log if entry[0] == "call"]
+    # Channel 0 stays at 0 degrees, so it isn't rewritten
+    assert [entry[2] for entry in calls] == [(ch, 10 * ch) for ch in range(1, 8)]
+
+def test_tdd_stub_channels_feed_chirp_timing():
+    tdd = RecordingDevice("tdd", 3, channel_attrs=TDD_CHANNEL_DEFAULTS, frame_length_ms=0.46)
+    timing = radar_hardware.chirp_timing(450, 522000, tdd.frame_length_ms, tdd.channel[0].on_ms)
+    assert timing["fft_size"] == 256
+    assert timing["buffer_size"] == int(0.46 * 1.75 * 522000 / 1000)
@@ -0,0 +1,40 @@
+'''fmcw_processing.SessionWriter output and capacity.'''
+
+import datetime
+import numpy as np
+from compact_storage import load_compact
+from fmcw_processing import SessionWriter
+
+FREQ = np.arange(256) * 522000 / 256
+START = datetime.datetime(2025, 3, 18, 12, 31, 26)
+
+def writer(tmp_path, max_frames, compact=False):
+    return SessionWriter(START, str(tmp_path / "Images"), str(tmp_path / "CSV"), 256, FREQ, 125e3, 180e3,
+                         4, 2, 0.368, "0.37-0.52", max_frames, compact=compact)
+
+def frame(i):
+    return np.full(len(FREQ), -60.0 + i)
+
+def test_frames_past_capacity_are_dropped(tmp_path):
+    session = writer(tmp_path, 10, compact=True)
+    accepted = [session.append(i * 0.03, frame(i), 0.4) for i in range(13)]
+    assert accepted == [True] * 10 + [False] * 3
+    assert session.dropped == 3
+    path = session.close()
+    assert path.endswith("_256x10.npz")
+    times, _, magnitudes, _ = load_compact(path)
+    assert len(times) == 10
+    assert np.allclose(magnitudes[:, 0], -60.0 + np.arange(10))
+    assert len(list((tmp_path / "Images").iterdir())) == 2
+
+def test_csv_is_renamed_with_the_frame_count(tmp_path):
+    session = writer(tmp_path, 10)
+    for i in range(10):
+        session.append(i * 0.03, frame(i), None if i % 3 else 0.4)
+    path = session.close()
+    assert path.endswith("_256x10.csv")
+    with open(path) as f:
+        rows = f.read().splitlines()
+    assert rows[0] == "Time Since Start (s),Frequency (Hz),Magnitude (dBFS),Range (m)"
+    assert len(rows) == 1 + 10 * int(session.band.sum())
+    assert not list((tmp_path / "CSV").glob("*.partial"))
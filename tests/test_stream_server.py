@@ -0,0 +1,63 @@
+'''StreamServer against a localhost client.'''
+
+import asyncio
+import numpy as np
+from stream_server import (SUBSCRIBE_DETECTIONS, SUBSCRIBE_SPECTRA, StreamServer, read_message,
+                           subscribe_message)
+
+FREQ = np.arange(256) * 522000 / 256
+
+def start_server():
+    return StreamServer(FREQ, 100e3, 130e3, host="127.0.0.1", port=0).start()
+
+async def wait_for(condition, timeout=2):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+async def connect(server, mode):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    writer.write(subscribe_message(mode))
+    await writer.drain()
+    hello = await read_message(reader)
+    await wait_for(lambda: any(client["mode"] == mode for client in server.stats()))
+    return reader, writer, hello
+
+def test_hello_spectra_and_detections():
+    server = start_server()
+    try:
+        async def run():
+            spectra, spectra_writer, hello = await connect(server, SUBSCRIBE_SPECTRA)
+            detections, detections_writer, _ = await connect(server, SUBSCRIBE_DETECTIONS)
+            s_dbfs = np.linspace(-80, -20, len(FREQ))
+            server.publish(1.5, s_dbfs, 2.25)
+            server.publish(1.6, s_dbfs, None)
+            first, second = await read_message(spectra), await read_message(spectra)
+            detection = await read_message(detections)
+            spectra_writer.close()
+            detections_writer.close()
+            return hello, first, second, detection
+        hello, first, second, detection = asyncio.run(run())
+    finally:
+        server.stop()
+    assert np.array_equal(hello["freq"], FREQ[server.band])
+    assert first["type"] == "spectrum" and first["seq"] == 0 and first["peak_range"] == 2.25
+    assert np.allclose(first["magnitudes"], np.linspace(-80, -20, len(FREQ))[server.band])
+    assert second["seq"] == 1 and second["peak_range"] is None
+    assert detection == {"type": "detection", "seq": 0, "timestamp": 1.5, "peak_range": 2.25}
+
+def test_stop_with_connected_client():
+    server = start_server()
+    thread = server._thread
+
+    async def run():
+        reader, writer, _ = await connect(server, SUBSCRIBE_DETECTIONS)
+        await asyncio.get_running_loop().run_in_executor(None, server.stop)
+        closed = await asyncio.wait_for(reader.read(), 2) == b""   # server side closed the connection
+        writer.close()
+        return closed
+    assert asyncio.run(run())
+    assert not thread.is_alive()
+    assert server.loop is None
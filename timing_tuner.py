@@ -0,0 +1,205 @@
+'''
+   timing_tuner.py
+   Finds the receive buffer size, burst count and PRI that give the highest sustained
+   frame rate. For every candidate (buffer_factor x burst_count x pri_pad_ms) the TDD
+   engine and rx_buffer_size are reprogrammed through the radar's CachedConfigs, frames
+   are captured and processed headless like capture_frame() does, and the tuner records
+   frames per second, receive and processing times, processing headroom (1 - p99
+   processing time / median receive time; negative means processing can't keep up with
+   acquisition), overruns (buffers too short for the chirp window, or failed reads) and
+   the fraction of frames with a detection.
+
+   The best candidate is the fastest one with no overruns, at least min_headroom, a
+   detection rate within detect_tolerance of the starting configuration and (unless
+   allowed) the same fft_size, so the frequency axis of existing datasets is kept. It is
+   written to timing_config.json, which FMCW_Bulk_Data_Export.py loads at startup
+   (timing_config_path). The frame rate does not include the GUI's plotting time.
+
+   Usage:
+       python3 timing_tuner.py --frames 100 --out timing_config.json
+       python3 timing_tuner.py --simulate      # simulated Pluto, no hardware needed
+'''
+
+import argparse
+import itertools
+import json
+import os
+import time
+import numpy as np
+from hw_config import TDD_CHANNEL_DEFAULTS, RecordingDevice
+from session_scheduler import RADAR_DEFAULTS, Radar
+
+BUFFER_FACTORS = [1.1, 1.25, 1.5, 1.75, 2.0]
+BURST_COUNTS = [1, 2, 4]
+PRI_PADS_MS = [0.005, 0.01, 0.02, 0.05]
+
+class SimulatedPluto(RecordingDevice):
+    """ Stand-in Pluto whose rx() returns a triggered chirp burst from one target
+    A read takes the buffer time plus a fixed transfer overhead. Each burst starts
+    on_ms plus a random trigger latency (up to jitter_ms) into the buffer and holds
+    burst_count chirps of the beat tone for a target at target_range, in noise.
+    Args:
+        tdd: TDD device the burst timing is read from (frame_length_ms, burst_count, channel[0].on_ms)
+        settings (dict): Radar settings (sample_rate, chirp_bw, ramp_time, signal_freq, freq_offset)
+        target_range (float): Simulated target distance (m)
+        overhead_ms (float): Transfer overhead per read
+        jitter_ms (float): Maximum trigger latency
+        snr_db (float): Tone to noise ratio per sample
+    """
+    def __init__(self, tdd, settings, target_range=1.0, overhead_ms=2.0, jitter_ms=0.02, snr_db=10, seed=0, log=None):
+        super().__init__("sdr", log=log, sample_rate=int(settings["sample_rate"]), rx_buffer_size=1024)
+        for attr, value in (("tdd", tdd), ("settings", settings), ("target_range", target_range),
+                            ("overhead_ms", overhead_ms), ("jitter_ms", jitter_ms), ("snr_db", snr_db),
+                            ("rng", np.random.default_rng(seed))):
+            object.__setattr__(self, attr, value)
+
+    def rx(self):
+        fs, n = self.sample_rate, int(self.rx_buffer_size)
+        time.sleep(n / fs + self.overhead_ms / 1e3)
+        settings = self.settings
+        ramp_s = settings["ramp_time"] / 1e6
+        slope = settings["chirp_bw"] / ramp_s
+        beat = settings["signal_freq"] + settings["freq_offset"] + 2 * slope * self.target_range / 3e8
+        amplitude = 2 ** 11 * 10 ** (-10 / 20)
+        noise = amplitude * 10 ** (-self.snr_db / 20) / np.sqrt(2)
+        data = (self.rng.normal(0, noise, n) + 1j * self.rng.normal(0, noise, n)).astype(np.complex64)
+        start = int((self.tdd.channel[0].on_ms + self.rng.uniform(0, self.jitter_ms)) / 1e3 * fs)
+        ramp_samples = int(ramp_s * fs)
+        t = np.arange(ramp_samples) / fs
+        tone = amplitude * np.exp(2j * np.pi * beat * t)
+        for chirp in range(int(self.tdd.burst_count)):
+            first = start + int(chirp * self.tdd.frame_length_ms / 1e3 * fs)
+            stop = min(first + ramp_samples, n)
+            if stop > first:
+                data[first:stop] += tone[:stop - first]
+        half = data / 2
+        return [half, half]
+
+def simulated_radar(settings=None, **sim_args):
+    """ Radar on a SimulatedPluto with recording stubs for the Phaser, GPIO pins and TDD engine """
+    settings = dict(RADAR_DEFAULTS, start_tx=False, **(settings or {}))
+    log = []
+    phaser = RecordingDevice("phaser", 8, ["_gpios"], log=log, freq_dev_time=settings["ramp_time"], element_spacing=0.014)
+    pins = RecordingDevice("pins", log=log)
+    tdd = RecordingDevice("tdd", 3, log=log, channel_attrs=TDD_CHANNEL_DEFAULTS,
+                          frame_length_ms=settings["ramp_time"] / 1e3 + settings["pri_pad_ms"], burst_count=settings["num_chirps"])
+    sdr = SimulatedPluto(tdd, settings, log=log, **sim_args)
+    return Radar(settings, sdr, phaser, pins, tdd)
+
+def candidate_grid(buffer_factors=BUFFER_FACTORS, burst_counts=BURST_COUNTS, pri_pads_ms=PRI_PADS_MS):
+    return [{"buffer_factor": f, "num_chirps": n, "pri_pad_ms": p}
+            for n, p, f in itertools.product(burst_counts, pri_pads_ms, buffer_factors)]
+
+def measure(radar, frames=100, warmup=3):
+    """ Captures and processes frames with the radar's current timing
+    Returns:
+        dict: fps, chirps_per_s, rx_ms and proc_ms (median), proc_p99_ms, headroom,
+            overruns, detect_rate, fft_size and buffer_size
+    """
+    timing, num_chirps = radar.timing, radar.settings["num_chirps"]
+    required = timing["start_offset_samples"] + (num_chirps - 1) * timing["num_samples_frame"] + timing["good_ramp_samples"]
+    rx_times, proc_times = np.empty(frames), np.empty(frames)
+    overruns = detections = 0
+    for i in range(-warmup, frames):
+        t0 = time.perf_counter()
+        try:
+            sum_data = radar.capture_raw()
+        except Exception:
+            sum_data = None
+        t1 = time.perf_counter()
+        peak_range = None
+        if sum_data is None or len(sum_data) < required:
+            overruns += i >= 0
+        else:
+            _, peak_range = radar.process(sum_data)
+        t2 = time.perf_counter()
+        if i >= 0:
+            rx_times[i], proc_times[i] = t1 - t0, t2 - t1
+            detections += peak_range is not None
+    elapsed = rx_times.sum() + proc_times.sum()
+    rx_ms = float(np.median(rx_times) * 1e3)
+    proc_p99_ms = float(np.percentile(proc_times, 99) * 1e3)
+    return {
+        "fps": frames / elapsed,
+        "chirps_per_s": frames * num_chirps / elapsed,
+        "rx_ms": rx_ms,
+        "proc_ms": float(np.median(proc_times) * 1e3),
+        "proc_p99_ms": proc_p99_ms,
+        "headroom": 1 - proc_p99_ms / rx_ms,
+        "overruns": overruns,
+        "detect_rate": detections / frames,
+        "fft_size": int(timing["fft_size"]),
+        "buffer_size": int(timing["buffer_size"]),
+    }
+
+def tune(radar, candidates, frames=100, min_headroom=0.2, detect_tolerance=0.05, allow_fft_change=False, report=print):
+    """ Measures the starting configuration and every candidate, then restores the best one
+    Returns:
+        tuple: (best result dict or None, baseline result, list of candidate results)
+    """
+    settings = radar.settings
+    baseline = dict(num_chirps=settings["num_chirps"], pri_pad_ms=settings["pri_pad_ms"],
+                    buffer_factor=settings["buffer_factor"])
+    baseline.update(measure(radar, frames))
+    report(format_result("baseline", baseline))
+    results = []
+    for candidate in candidates:
+        radar.set_timing(**candidate)
+        result = dict(candidate, **measure(radar, frames))
+        result["eligible"] = (result["overruns"] == 0 and result["headroom"] >= min_headroom
+                              and result["detect_rate"] >= baseline["detect_rate"] - detect_tolerance
+                              and (allow_fft_change or result["fft_size"] == baseline["fft_size"]))
+        results.append(result)
+        report(format_result("candidate", result))
+    eligible = [r for r in results if r["eligible"]]
+    best = max(eligible, key=lambda r: r["fps"]) if eligible else None
+    keep = best if best is not None else baseline
+    radar.set_timing(keep["num_chirps"], keep["pri_pad_ms"], keep["buffer_factor"])
+    return best, baseline, results
+
+def format_result(label, r):
+    flag = "" if r.get("eligible", True) else "  (rejected)"
+    return (f"{label:<9} burst {r['num_chirps']}  pad {r['pri_pad_ms']:.3f} ms  factor {r['buffer_factor']:.2f}  "
+            f"buffer {r['buffer_size']:5d}  fft {r['fft_size']:4d}  {r['fps']:6.1f} fps  rx {r['rx_ms']:5.2f} ms  "
+            f"proc p99 {r['proc_p99_ms']:5.2f} ms  headroom {r['headroom']:5.2f}  overruns {r['overruns']}  "
+            f"detect {r['detect_rate']:.2f}{flag}")
+
+def write_config(path, best, baseline, results):
+    """ Writes the chosen timing for radar_hardware.load_timing_config(), with the measurements """
+    config = {key: best[key] for key in ("num_chirps", "pri_pad_ms", "buffer_factor")}
+    config.update({"rx_buffer_size": best["buffer_size"], "fft_size": best["fft_size"], "fps": best["fps"],
+                   "headroom": best["headroom"], "baseline_fps": baseline["fps"],
+                   "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results})
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=1)
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure frame rate over buffer/burst/PRI settings and save the best.')
+    parser.add_argument('--frames', type=int, default=100, help='Frames measured per candidate (default: 100)')
+    parser.add_argument('--buffer-factors', type=float, nargs='+', default=BUFFER_FACTORS, help='Buffer length / burst time')
+    parser.add_argument('--burst-counts', type=int, nargs='+', default=BURST_COUNTS, help='Chirps per receive buffer')
+    parser.add_argument('--pri-pads', type=float, nargs='+', default=PRI_PADS_MS, help='Dead time added to the ramp (ms)')
+    parser.add_argument('--min-headroom', type=float, default=0.2, help='Minimum processing headroom (default: 0.2)')
+    parser.add_argument('--detect-tolerance', type=float, default=0.05, help='Allowed detection rate drop (default: 0.05)')
+    parser.add_argument('--allow-fft-change', action='store_true', help='Accept candidates that change fft_size')
+    parser.add_argument('--simulate', action='store_true', help='Use a simulated Pluto instead of the hardware')
+    parser.add_argument('--out', default='timing_config.json', help='Output file (default: timing_config.json)')
+    args = parser.parse_args()
+
+    radar = simulated_radar() if args.simulate else Radar(dict(RADAR_DEFAULTS))
+    try:
+        best, baseline, results = tune(radar, candidate_grid(args.buffer_factors, args.burst_counts, args.pri_pads),
+                                       args.frames, args.min_headroom, args.detect_tolerance, args.allow_fft_change)
+    finally:
+        radar.close()
+    if best is None:
+        print("No candidate met the constraints; keeping the current timing")
+        return
+    write_config(args.out, best, baseline, results)
+    print(f"Best: burst {best['num_chirps']}, pad {best['pri_pad_ms']} ms, factor {best['buffer_factor']} -> "
+          f"{best['fps']:.1f} fps ({baseline['fps']:.1f} fps before), saved to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+'''
+   verify_dataset.py
+   Integrity checks for the DataSet tree, run across a process pool. For every
+   FilteredCSV file it checks:
+       - the file name parses and its bin label matches the bin directory (flags names
+         such as "binemptym" in no_object)
+       - the frames x bins shape is the expected one
+       - the Range column is constant across the bins of each frame
+       - the calcdist in the name matches the mode of the per-frame ranges (over all
+         frames, the first img_size frames or frames 1..img_size, the windows the
+         exporter has used)
+       - a PNG with the same name exists in Images/ and has the expected size
+   Verdicts are stored in verify_cache.json keyed by the CSV and PNG fingerprints (size
+   and mtime), so later runs only re-check new or modified files. Exits with status 1
+   if any file has problems.
+
+   Usage: python3 verify_dataset.py --dir DataSet --workers 8
+'''
+
+import argparse
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dataset_io import iter_filtered_csvs, load_filtered_rows, parse_sample_name
+from windowing import window_modes
+
+CACHE_VERSION = 1
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def file_fingerprint(path):
+    """ [size, mtime_ns] of path, or None if it doesn't exist """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def png_size(path):
+    """ (width, height) from a PNG header without decoding the image """
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE:
+        raise ValueError("not a PNG file")
+    return struct.unpack('>II', header[16:24])
+
+def png_path_for(csv_path):
+    bin_path = os.path.dirname(os.path.dirname(csv_path))
+    return os.path.join(bin_path, "Images", os.path.splitext(os.path.basename(csv_path))[0] + ".png")
+
+def check_file(task):
+    """ Worker: problems found in one CSV and its PNG, each as "kind: detail" """
+    csv_path, bin_dir, expected = task
+    problems = []
+    info = parse_sample_name(csv_path)
+    if info is None:
+        problems.append("unparsable file name")
+    elif info["bin"] != bin_dir:
+        problems.append(f"irregular bin name: 'bin{info['bin']}m' in {bin_dir}")
+
+    try:
+        rows = load_filtered_rows(csv_path)
+    except Exception as e:
+        problems.append(f"unreadable CSV: {e}")
+        rows = None
+    if rows is not None:
+        frames, bins = rows.shape[:2]
+        if (frames, bins) != (expected["frames"], expected["bins"]):
+            problems.append(f"shape: {frames}x{bins}, expected {expected['frames']}x{expected['bins']}")
+        if rows.shape[2] < 4:
+            problems.append("no Range column")
+        else:
+            ranges = rows[:, :, 3]
+            first = ranges[:, :1]
+            constant = (ranges == first) | (np.isnan(ranges) & np.isnan(first))
+            if not constant.all():
+                bad_frames = np.flatnonzero(~constant.all(axis=1))
+                problems.append(f"range not constant: varies within {len(bad_frames)} frames (first at frame {bad_frames[0]})")
+            if info is not None:
+                frame_ranges = ranges[:, 0]
+                img_size = expected["img_size"]
+                candidates = [window_modes(frame_ranges, frames, frames)[0]]
+                for start in (0, 1):
+                    if frames >= start + img_size:
+                        candidates.append(window_modes(frame_ranges[start:start + img_size], img_size, img_size)[0])
+                if not any(abs(c - info["calcdist"]) <= 0.0051 for c in candidates):
+                    problems.append(f"calcdist mismatch: {info['calcdist']:.3f} in name, recomputed {candidates[0]:.3f}")
+
+    png_path = png_path_for(csv_path)
+    if not os.path.exists(png_path):
+        problems.append("missing PNG")
+    else:
+        try:
+            width, height = png_size(png_path)
+            if (width, height) != (expected["img_size"], expected["img_size"]):
+                problems.append(f"PNG size: {width}x{height}, expected {expected['img_size']}x{expected['img_size']}")
+        except (OSError, ValueError) as e:
+            problems.append(f"unreadable PNG: {e}")
+    return problems
+
+def load_cache(cache_path, expected):
+    """ Stored verdicts, or an empty dict if missing or made with different expectations """
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path) as f:
+        cache = json.load(f)
+    if cache.get("version") != CACHE_VERSION or cache.get("expected") != expected:
+        return {}
+    return cache["files"]
+
+def save_cache(cache_path, expected, verdicts):
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": CACHE_VERSION, "expected": expected, "files": verdicts}, f, indent=1)
+    os.replace(tmp_path, cache_path)
+
+def verify_dataset(base_dir="DataSet", cache_path="verify_cache.json", frames=57, bins=60, img_size=56, workers=None):
+    """ Checks every new or modified file and updates the verdict cache
+    Returns:
+        tuple: (verdicts {relative csv path: {"fingerprint", "problems"}}, number of files checked this run)
+    """
+    expected = {"frames": frames, "bins": bins, "img_size": img_size}
+    cached = load_cache(cache_path, expected)
+    verdicts, tasks, keys = {}, [], []
+    for bin_dir, csv_path in iter_filtered_csvs(base_dir):
+        key = os.path.relpath(csv_path, base_dir)
+        fingerprint = [file_fingerprint(csv_path), file_fingerprint(png_path_for(csv_path))]
+        if key in cached and cached[key]["fingerprint"] == fingerprint:
+            verdicts[key] = cached[key]
+        else:
+            verdicts[key] = {"fingerprint": fingerprint, "problems": None}
+            tasks.append((csv_path, bin_dir, expected))
+            keys.append(key)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for key, problems in zip(keys, executor.map(check_file, tasks, chunksize=16)):
+            verdicts[key]["problems"] = problems
+    save_cache(cache_path, expected, verdicts)
+    return verdicts, len(tasks)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the DataSet tree for inconsistent files.')
+    parser.add_argument('--dir', default='DataSet', help='Dataset directory (default: DataSet)')
+    parser.add_argument('--cache', default='verify_cache.json', help='Verdict cache (default: verify_cache.json)')
+    parser.add_argument('--frames', type=int, default=57, help='Expected frames per CSV (default: 57)')
+    parser.add_argument('--bins', type=int, default=60, help='Expected bins per frame (default: 60)')
+    parser.add_argument('--img-size', type=int, default=56, help='Expected PNG size and frames per image (default: 56)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--max-report', type=int, default=50, help='Files listed in the report (default: 50)')
+    args = parser.parse_args()
+
+    verdicts, checked = verify_dataset(args.dir, args.cache, args.frames, args.bins, args.img_size, args.workers)
+    failed = {key: v["problems"] for key, v in verdicts.items() if v["problems"]}
+    print(f"Checked {checked} new or modified files, {len(verdicts) - checked} unchanged")
+
+    counts = {}
+    for problems in failed.values():
+        for problem in problems:
+            kind = problem.split(":")[0]
+            counts[kind] = counts.get(kind, 0) + 1
+    print(f"{len(failed)} of {len(verdicts)} files have problems")
+    for kind, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"  {kind}: {count}")
+    for key in sorted(failed)[:args.max_report]:
+        print(f"{key}: {'; '.join(failed[key])}")
+    if len(failed) > args.max_report:
+        print(f"... {len(failed) - args.max_report} more, see {args.cache}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+'''
+   windowing.py
+   Cuts a session's frames x bins magnitude array into fixed-length sample windows.
+   Windows are strided views over the session array, so overlapping windows cost
+   nothing until they are rendered or written out.
+'''
+
+import numpy as np
+
+def sliding_windows(data, window, stride=1):
+    """ Overlapping windows of consecutive frames, as a read-only view
+    Args:
+        data (np.array): Session data shaped (frames, ...), e.g. (frames, bins)
+        window (int): Frames per window
+        stride (int): Frames between the starts of consecutive windows
+    Returns:
+        np.array: View shaped (num_windows, window, ...). Empty if data has fewer than window frames.
+    """
+    data = np.asarray(data)
+    if stride < 1:
+        raise ValueError("stride must be at least 1")
+    if data.shape[0] < window:
+        return np.empty((0, window) + data.shape[1:], dtype=data.dtype)
+    views = np.lib.stride_tricks.sliding_window_view(data, window, axis=0)[::stride]
+    # sliding_window_view puts the window axis last; move it next to the window index
+    return np.moveaxis(views, -1, 1)
+
+def window_modes(values, window, stride=1, decimals=2, default=0.0):
+    """ Most common rounded value in each window, ignoring NaN
+    Matches the calc_dist label of export_data_to_csv(), with ties going to the
+    smallest value so labels are reproducible.
+    Args:
+        values (np.array): One value per frame (e.g. peak range), NaN where missing
+        window, stride (int): Same windowing as sliding_windows()
+        decimals (int): Rounding applied before counting
+        default (float): Label for windows with no values
+    Returns:
+        np.array: One label per window
+    """
+    values = np.round(np.asarray(values, dtype=float), decimals)
+    num_windows = max(0, (values.size - window) // stride + 1)
+    if num_windows == 0:
+        return np.empty(0)
+
+    valid = ~np.isnan(values)
+    uniques, codes = np.unique(values[valid], return_inverse=True)
+    if uniques.size == 0:
+        return np.full(num_windows, default)
+
+    # Running per-value counts; window counts are differences of the running totals
+    one_hot = np.zeros((values.size, uniques.size), dtype=np.int32)
+    one_hot[np.flatnonzero(valid), codes] = 1
+    running = np.concatenate((np.zeros((1, uniques.size), dtype=np.int32), np.cumsum(one_hot, axis=0)))
+    starts = np.arange(num_windows) * stride
+    counts = running[starts + window] - running[starts]
+
+    modes = uniques[np.argmax(counts, axis=1)]
+    return np.where(counts.any(axis=1), modes, default)